@@ -4,4 +4,7 @@ from waitress import serve
 
 from snodas.wsgi import application
 
-serve(application, host='0.0.0.0', port=os.environ['PORT'], url_scheme='https')  # noqa: S104
+# zonal stats workers re-import __main__ when started, which
+# must not start another server (see snodas.snodas.zonal_stats)
+if __name__ == '__main__':
+    serve(application, host='0.0.0.0', port=os.environ['PORT'], url_scheme='https')  # noqa: S104
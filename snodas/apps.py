@@ -14,3 +14,10 @@ class SnodasConfig(AppConfig):
         # to override the amount of parallelism by setting the var themselves.
         if 'GDAL_NUM_THREADS' not in os.environ:
             os.environ['GDAL_NUM_THREADS'] = 'ALL_CPUS'
+
+        from django.conf import settings
+
+        from snodas.snodas.raster import get_aoi_cache, get_tile_cache
+
+        get_tile_cache().maxbytes = settings.SNODAS_TILE_CACHE_BYTES
+        get_aoi_cache().maxbytes = settings.SNODAS_AOI_CACHE_BYTES
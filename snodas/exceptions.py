@@ -4,3 +4,7 @@ class SNODASError(Exception):
 
 class GeoJSONValidationError(SNODASError, TypeError):
     pass
+
+
+class IncompleteDateError(SNODASError, RuntimeError):
+    pass
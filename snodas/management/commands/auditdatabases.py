@@ -1,3 +1,4 @@
+from argparse import ArgumentParser
 from collections.abc import Iterable
 from dataclasses import asdict, dataclass
 from datetime import date
@@ -10,6 +11,7 @@ from django.db import connection
 from snodas import types
 from snodas.snodas.db import get_raster_database
 from snodas.snodas.fileinfo import Product, SNODASFileInfo
+from snodas.snodas.manifest import ManifestEntry
 
 
 @dataclass
@@ -28,18 +30,34 @@ class RasterTracker:
         cls: type[Self],
         rasters: Iterable[SNODASFileInfo],
     ) -> dict[date, Self]:
-        _rs: dict[date, list[SNODASFileInfo]] = {}
-        for raster in rasters:
+        return cls._from_products(
+            (raster.datetime.date(), raster.product) for raster in rasters
+        )
+
+    @classmethod
+    def from_manifest(
+        cls: type[Self],
+        entries: Iterable[ManifestEntry],
+    ) -> dict[date, Self]:
+        return cls._from_products((entry.date, entry.product) for entry in entries)
+
+    @classmethod
+    def _from_products(
+        cls: type[Self],
+        products: Iterable[tuple[date, Product]],
+    ) -> dict[date, Self]:
+        _rs: dict[date, list[Product]] = {}
+        for date_, product in products:
             try:
-                _rs[raster.datetime.date()].append(raster)
+                _rs[date_].append(product)
             except KeyError:
-                _rs[raster.datetime.date()] = [raster]
+                _rs[date_] = [product]
 
         return {
             date_: cls(
-                **{r.product.value: True for r in rasters},
+                **{product.value: True for product in products},
             )
-            for date_, rasters in _rs.items()
+            for date_, products in _rs.items()
         }
 
     @classmethod
@@ -71,8 +89,21 @@ class Command(BaseCommand):
     requires_system_checks = []  # type: ignore  # noqa: RUF012
     can_import_settings = True
 
-    def handle(self: Self, *_, **__) -> None:
+    def add_arguments(self: Self, parser: ArgumentParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--walk',
+            action='store_true',
+            default=False,
+            help=(
+                'Walk the COGs on disk even if the raster db has a complete '
+                'manifest, written since cogs/ last changed, to diff against'
+            ),
+        )
+
+    def handle(self: Self, *_, walk: bool = False, **__) -> None:
         self.raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+        self.walk = walk or not self.raster_db.manifest.is_current()
         aoi_diff = self.diff_aois()
         snodas_diff = self.diff_snodas()
         diff = aoi_diff or snodas_diff
@@ -115,9 +146,14 @@ class Command(BaseCommand):
         return aoi_diff
 
     def diff_snodas(self: Self) -> bool:
-        rdb_rasters = RasterTracker.from_raster_db(
-            self.raster_db.snodas_rasters(),
-        )
+        if self.walk:
+            rdb_rasters = RasterTracker.from_raster_db(
+                self.raster_db.snodas_rasters(),
+            )
+        else:
+            rdb_rasters = RasterTracker.from_manifest(
+                self.raster_db.manifest.entries(),
+            )
         pg_rasters = RasterTracker.from_pg_rows(self.get_pg_rasters())
 
         for date_, raster in rdb_rasters.items():
@@ -143,7 +179,7 @@ class Command(BaseCommand):
     def get_pg_aois() -> list[types.StationTriplet]:
         with connection.cursor() as cursor:
             cursor.execute(
-                'select awdb_id from pourpoint.pourpoint ' 'where polygon is not null',
+                'select awdb_id from pourpoint.pourpoint where polygon is not null',
             )
             return [types.StationTriplet(row[0]) for row in cursor.fetchall()]
 
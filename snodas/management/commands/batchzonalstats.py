@@ -0,0 +1,139 @@
+from argparse import ArgumentParser
+from datetime import date
+from pathlib import Path
+from typing import Self
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from snodas import types
+from snodas.management import utils
+from snodas.snodas.db import get_raster_database
+from snodas.snodas.fileinfo import Product
+from snodas.snodas.raster import AOIRaster, AOIRasterWithArea, get_row_areas
+from snodas.snodas.raster_collection import RasterCollection
+from snodas.snodas.zonal_stats import ZonalStats
+
+
+class Command(BaseCommand):
+    help = """Calculate zonal stats for many AOIs at once, writing
+    a CSV per AOI. Each SNODAS tile is only read once for all
+    the AOIs that intersect it."""
+
+    requires_system_checks = []  # type: ignore  # noqa: RUF012
+    can_import_settings = True
+
+    def add_arguments(self: Self, parser: ArgumentParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            'start_date',
+            type=date.fromisoformat,
+            help='First date to calculate, as YYYY-MM-DD.',
+        )
+        parser.add_argument(
+            'end_date',
+            nargs='?',
+            type=date.fromisoformat,
+            help='Last date to calculate, as YYYY-MM-DD. Default is start_date.',
+        )
+        parser.add_argument(
+            '-o',
+            '--output-dir',
+            required=True,
+            type=utils.directory,
+            help='Path to a directory in which to write the CSV files.',
+        )
+        parser.add_argument(
+            '-t',
+            '--triplet',
+            action='append',
+            dest='triplets',
+            help=(
+                'Station triplet of an AOI to include. '
+                'Can be repeated. Default is all AOIs in the raster db.'
+            ),
+        )
+        parser.add_argument(
+            '-p',
+            '--product',
+            action='append',
+            dest='products',
+            type=Product,
+            choices=list(Product),
+            help='Product to include. Can be repeated. Default is all products.',
+        )
+        parser.add_argument(
+            '--elevation-band-step',
+            type=int,
+            default=1000,
+            help='Size of the elevation bands in feet. Default is 1000.',
+        )
+
+    def handle(
+        self: Self,
+        start_date: date,
+        end_date: date | None,
+        output_dir: Path,
+        triplets: list[str] | None,
+        products: list[Product] | None,
+        elevation_band_step: int,
+        *_,
+        **__,
+    ) -> None:
+        raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+        row_areas = get_row_areas()
+        query = types.DateRangeQuery(
+            start_date=start_date,
+            end_date=end_date or start_date,
+        )
+
+        if triplets:
+            aois = [
+                AOIRasterWithArea.from_aoi_raster(
+                    AOIRaster.open(
+                        raster_db.aoi_raster_path_from_triplet(
+                            types.StationTriplet(triplet),
+                        ),
+                    ),
+                    row_areas,
+                )
+                for triplet in triplets
+            ]
+        else:
+            aois = [
+                AOIRasterWithArea.from_aoi_raster(aoi, row_areas)
+                for aoi in raster_db.aoi_rasters()
+            ]
+
+        if not aois:
+            raise CommandError('No AOIs to calculate.')
+
+        snodas_rasters = RasterCollection.from_products_query(
+            query=query,
+            products=set(products or Product),
+        )
+
+        print(  # noqa: T201
+            f'Calculating zonal stats for {len(aois)} AOIs '
+            f'over {len(snodas_rasters.dates)} dates...',
+        )
+        results = ZonalStats.calculate_batch(
+            aois,
+            snodas_rasters,
+            elevation_band_step_feet=elevation_band_step,
+            # the batch calculates the requested step, never the base step
+            persist_band_index=(
+                settings.SNODAS_PERSIST_BAND_INDEX
+                and ZonalStats.persisted_step(elevation_band_step, None)
+            ),
+        )
+
+        for triplet, stats in results.items():
+            path = output_dir / query.csv_name(
+                triplet.replace(':', '_'),
+                zone_size=elevation_band_step,
+            )
+            with path.open('w', newline='') as f:
+                stats.dump_to_csv(f)
+
+        print('Processing completed successfully.')  # noqa: T201
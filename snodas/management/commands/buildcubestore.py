@@ -0,0 +1,48 @@
+from argparse import ArgumentParser
+from typing import Self
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from snodas.snodas.db import get_raster_database
+
+
+class Command(BaseCommand):
+    help = """Backfill the SNODAS cube store from the COGs in the raster db.
+    Copies every AOI tile of every date not already in the store, or whose
+    COG has changed since it was stored, so run it after enabling the cube
+    store and after adding new AOIs."""
+
+    requires_system_checks = []  # type: ignore  # noqa: RUF012
+    can_import_settings = True
+
+    def add_arguments(self: Self, parser: ArgumentParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            default=False,
+            help='Rewrite tiles already in the cube store',
+        )
+
+    def handle(self: Self, *_, force: bool = False, **__) -> None:
+        raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+        tiles = raster_db.aoi_tiles()
+
+        if not tiles:
+            raise CommandError('No AOI rasters found, so no tiles to store.')
+
+        cubes = raster_db.cube_store()
+        rasters = sorted(
+            raster_db.snodas_rasters(),
+            key=lambda raster: (raster.datetime, raster.product),
+        )
+
+        print(  # noqa: T201
+            f'Backfilling {len(tiles)} tiles from {len(rasters)} rasters...',
+        )
+        written = 0
+        for raster in rasters:
+            written += cubes.add_raster(raster, tiles, force=force)
+
+        print(f'Wrote {written} tiles. Processing completed successfully.')  # noqa: T201
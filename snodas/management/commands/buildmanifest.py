@@ -0,0 +1,26 @@
+from typing import Self
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from snodas.snodas.db import get_raster_database
+
+
+class Command(BaseCommand):
+    help = """Rebuild the manifest of the SNODAS COGs in the raster db from
+    the COGs on disk. New dates are added to the manifest as they are
+    imported, but only once it has been built is it treated as complete,
+    so run this once for an existing raster db, or to resync it after
+    COGs are added or removed by hand."""
+
+    requires_system_checks = []  # type: ignore  # noqa: RUF012
+    can_import_settings = True
+
+    def handle(self: Self, *_, **__) -> None:
+        raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+
+        print(f'Building manifest {raster_db.manifest.path}...')  # noqa: T201
+        dates = raster_db.manifest.rebuild()
+        print(  # noqa: T201
+            f'Recorded {dates} dates. Processing completed successfully.',
+        )
@@ -0,0 +1,74 @@
+from argparse import ArgumentParser
+from datetime import date
+from typing import Self
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from snodas.exceptions import IncompleteDateError
+from snodas.snodas.db import get_raster_database
+
+
+class Command(BaseCommand):
+    help = """Write the consolidated multi-band raster for dates already
+    in the raster db, combining the product COGs of each date into one
+    COG. The product COGs are left in place. Dates missing any product
+    are skipped and listed at the end."""
+
+    requires_system_checks = []  # type: ignore  # noqa: RUF012
+    can_import_settings = True
+
+    def add_arguments(self: Self, parser: ArgumentParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            'dates',
+            nargs='*',
+            type=date.fromisoformat,
+            help='Dates to consolidate, as YYYY-MM-DD. Default is all dates.',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            default=False,
+            help='Rewrite consolidated rasters that already exist',
+        )
+
+    def handle(
+        self: Self,
+        dates: list[date],
+        *_,
+        force: bool = False,
+        **__,
+    ) -> None:
+        raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+
+        if not dates:
+            dates = sorted(
+                {raster.datetime.date() for raster in raster_db.snodas_rasters()},
+            )
+
+        written = 0
+        incomplete: list[date] = []
+        for date_ in dates:
+            if not force and raster_db.consolidated_raster_path(date_).exists():
+                continue
+
+            print(f'Consolidating rasters for {date_}...')  # noqa: T201
+            try:
+                raster_db.consolidate_snodas_rasters(date_, force=force)
+            except IncompleteDateError as e:
+                # dates missing a product are skipped so the rest are backfilled
+                print(f'Skipping incomplete date {date_}: {e}')  # noqa: T201
+                incomplete.append(date_)
+                continue
+            written += 1
+
+        if incomplete:
+            print(  # noqa: T201
+                f'Skipped {len(incomplete)} incomplete dates: '
+                f'{", ".join(map(str, incomplete))}',
+            )
+
+        print(  # noqa: T201
+            f'Consolidated {written} dates. Processing completed successfully.',
+        )
@@ -33,10 +33,27 @@ class Command(BaseCommand):
             default=False,
             help='Attempt database creation even if already exists',
         )
+        parser.add_argument(
+            '--npy-companions',
+            action='store_true',
+            default=False,
+            help=(
+                'Also write an uncompressed npy copy of the DEM, which is '
+                'memory mapped rather than decoded; see writenpycompanions'
+            ),
+        )
 
-    def handle(self: Self, dem: Path, *_, force: bool = False, **__) -> None:
+    def handle(
+        self: Self,
+        dem: Path,
+        *_,
+        force: bool = False,
+        npy_companions: bool = False,
+        **__,
+    ) -> None:
         RasterDatabase.create(
             path=settings.SNODAS_RASTERDB,
             input_dem_path=dem,
             force=force,
+            npy_companions=npy_companions,
         )
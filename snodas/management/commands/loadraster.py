@@ -93,7 +93,12 @@ class Command(BaseCommand):
     ) -> None:
         print('Importing rasters into raster db...')  # noqa: T201
         raster_db = get_raster_database(settings.SNODAS_RASTERDB)
-        raster_db.import_snodas_rasters(raster_set, force=force)
+        raster_db.import_snodas_rasters(
+            raster_set,
+            force=force,
+            cube_store=settings.SNODAS_CUBE_STORE,
+            consolidate=settings.SNODAS_CONSOLIDATED_RASTERS,
+        )
 
     def _write_pg(self: Self, raster_set: SNODASInputRasterSet) -> None:
         print('Inserting record into legacy database...')  # noqa: T201
@@ -0,0 +1,129 @@
+import json
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Self
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from snodas.exceptions import GeoJSONValidationError
+from snodas.management import utils
+from snodas.snodas.aoi import AOI
+from snodas.snodas.db import get_raster_database
+
+
+class Command(BaseCommand):
+    help = """Rasterize many AOIs into the raster db at once, in parallel,
+    e.g., to rebuild every AOI raster after the DEM is replaced. AOIs are
+    read from a directory of BAGIS pourpoint geojson files, or if no
+    directory is given, from every pourpoint with a polygon and a station
+    triplet in the database. The DEM is only read once, and shared by all
+    workers."""
+
+    requires_system_checks = []  # type: ignore  # noqa: RUF012
+    can_import_settings = True
+
+    def add_arguments(self: Self, parser: ArgumentParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            'geojson_dir',
+            nargs='?',
+            type=utils.directory,
+            help=(
+                'Path to a directory of BAGIS pourpoint geojson files. '
+                'Default is all pourpoints in the database.'
+            ),
+        )
+        parser.add_argument(
+            '-f',
+            '--force',
+            action='store_true',
+            default=False,
+            help='Overwrite AOI rasters that already exist',
+        )
+        parser.add_argument(
+            '-j',
+            '--max-workers',
+            type=int,
+            help='Number of worker processes. Default is the number of CPUs.',
+        )
+
+    def handle(
+        self: Self,
+        geojson_dir: Path | None,
+        *_,
+        force: bool = False,
+        max_workers: int | None = None,
+        **__,
+    ) -> None:
+        aois = (
+            self._aois_from_dir(geojson_dir)
+            if geojson_dir is not None
+            else self._aois_from_pg()
+        )
+
+        if not aois:
+            raise CommandError('No AOIs with polygons to rasterize.')
+
+        raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+
+        print(f'Rasterizing {len(aois)} AOIs...')  # noqa: T201
+        failed = 0
+        for triplet, error in raster_db.rasterize_aois(
+            aois,
+            force=force,
+            max_workers=max_workers,
+        ):
+            if error is None:
+                print(f"Rasterized AOI '{triplet}'")  # noqa: T201
+            else:
+                failed += 1
+                print(f"Failed to rasterize AOI '{triplet}': {error}")  # noqa: T201
+
+        if failed:
+            raise CommandError(f'Failed to rasterize {failed} of {len(aois)} AOIs.')
+
+        print('Processing completed successfully.')  # noqa: T201
+
+    @staticmethod
+    def _aois_from_dir(geojson_dir: Path) -> list[AOI]:
+        aois: list[AOI] = []
+        for path in sorted(geojson_dir.glob('*.geojson')):
+            try:
+                aoi = AOI.from_geojson(path)
+            except GeoJSONValidationError as e:
+                print(f"Skipping invalid pourpoint '{path}': {e}")  # noqa: T201
+                continue
+
+            if aoi.polygon is not None:
+                aois.append(aoi)
+        return aois
+
+    @staticmethod
+    def _aois_from_pg() -> list[AOI]:
+        # AOI rasters are named by station triplet, so
+        # pourpoints without one (an awdb_id) are skipped
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'select awdb_id, name, source, '
+                'ST_AsGeoJSON(point), ST_AsGeoJSON(polygon) '
+                'from pourpoint.pourpoint '
+                'where polygon is not null and awdb_id is not null',
+            )
+            rows = cursor.fetchall()
+
+        return [
+            AOI(
+                # pourpoints from the database have no source file
+                path=Path('pourpoint.pourpoint'),
+                properties={},
+                station_triplet=triplet,
+                name=name,
+                source=source,
+                point=json.loads(point),
+                polygon=json.loads(polygon),
+            )
+            for triplet, name, source, point, polygon in rows
+        ]
@@ -0,0 +1,20 @@
+from typing import Self
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from snodas.snodas.db import get_raster_database
+
+
+class Command(BaseCommand):
+    help = """Write the uncompressed npy copy of the DEM of an existing
+    raster db, which is memory mapped rather than decoded when reading the
+    DEM. Rerun it after the DEM is replaced, as an older copy is ignored."""
+
+    requires_system_checks = []  # type: ignore  # noqa: RUF012
+    can_import_settings = True
+
+    def handle(self: Self, *_, **__) -> None:
+        raster_db = get_raster_database(settings.SNODAS_RASTERDB)
+        raster_db.write_npy_companions()
+        print('Processing completed successfully.')  # noqa: T201
@@ -31,6 +31,44 @@ SITE_DOMAIN_NAME = conf_settings.get('SITE_DOMAIN_NAME', None)
 SNODAS_RASTERDB = Path(conf_settings.get('SNODAS_RASTERDB')).resolve()
 SUBDOMAINS = conf_settings.get('SUBDOMAINS', [])
 
+# zonal stats over fewer rasters than this are computed serially;
+# set to None in the conf file to disable the process pool entirely
+SNODAS_ZONAL_STATS_PARALLEL_THRESHOLD = conf_settings.get(
+    'SNODAS_ZONAL_STATS_PARALLEL_THRESHOLD',
+    50,
+)
+SNODAS_ZONAL_STATS_MAX_WORKERS = conf_settings.get(
+    'SNODAS_ZONAL_STATS_MAX_WORKERS',
+    None,
+)
+# save AOI elevation band indexes beside the AOI rasters
+SNODAS_PERSIST_BAND_INDEX = conf_settings.get('SNODAS_PERSIST_BAND_INDEX', True)
+# keep calculated zonal stats in the raster db for reuse by later requests
+SNODAS_ZONAL_STATS_STORE = conf_settings.get('SNODAS_ZONAL_STATS_STORE', True)
+# zonal stats for band steps that are a multiple of this are merged from
+# results for bands of this step, so stored results serve many steps;
+# set to None in the conf file to calculate every step separately
+SNODAS_ZONAL_STATS_BASE_STEP = conf_settings.get('SNODAS_ZONAL_STATS_BASE_STEP', 100)
+# also keep per-tile time series cubes of the SNODAS rasters for AOI
+# tiles, written on load; run buildcubestore after enabling or adding AOIs
+SNODAS_CUBE_STORE = conf_settings.get('SNODAS_CUBE_STORE', False)
+# read SNODAS products from the consolidated multi-band raster of each date,
+# where one exists; loadraster writes them and consolidaterasters backfills
+SNODAS_CONSOLIDATED_RASTERS = conf_settings.get('SNODAS_CONSOLIDATED_RASTERS', False)
+# memory budget for decoded SNODAS tiles cached per process; 0 disables caching.
+# requests calculated serially (see the parallel threshold) use the server
+# process's cache, and those in parallel the caches of its workers, which
+# live as long as the server and split the same budget between them
+SNODAS_TILE_CACHE_BYTES = conf_settings.get(
+    'SNODAS_TILE_CACHE_BYTES',
+    256 * 1024 * 1024,
+)
+# memory budget for opened AOI rasters cached per process; 0 disables caching
+SNODAS_AOI_CACHE_BYTES = conf_settings.get(
+    'SNODAS_AOI_CACHE_BYTES',
+    256 * 1024 * 1024,
+)
+
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = conf_settings.get('DEBUG', False)
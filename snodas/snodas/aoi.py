@@ -1,6 +1,7 @@
 import json
 
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import Any, Self
 
@@ -95,13 +96,20 @@ class AOI:
 
         return cls(path=path, **kwargs)
 
-    @property
+    @cached_property
     def geometry(self: Self) -> ogr.Geometry:
+        # parsed once, as rasterizing an AOI uses it several times
         if not self.polygon:
             raise ValueError('AOI does not have a polygon')
 
         return ogr.CreateGeometryFromJson(json.dumps(self.polygon))
 
+    def __getstate__(self: Self) -> dict[str, Any]:
+        # OGR geometries cannot be pickled, so are reparsed after unpickling
+        state = self.__dict__.copy()
+        state.pop('geometry', None)
+        return state
+
     def to_tile_extent(self: Self) -> tuple[Tile, Tile]:
         xmin, xmax, ymin, ymax = self.geometry.GetEnvelope()
         upperleft = LatLon(lat=ymax, lon=xmin).to_pixel()
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import os
+import threading
+
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+from snodas import types
+from snodas.snodas.fileinfo import Product
+
+if TYPE_CHECKING:
+    from snodas.snodas.manifest import RasterManifest
+
+DATE_FORMAT = '%Y%m%d'
+
+
+def match_products(names: Iterable[str]) -> dict[Product, list[str]]:
+    """Group the file names of a date directory by product, matching
+    them the same way as globbing with Product.to_glob()."""
+    names = sorted(names)
+    matches: dict[Product, list[str]] = {}
+    for product in Product:
+        pattern = product.to_glob()
+        matching = [name for name in names if fnmatchcase(name, pattern)]
+        if matching:
+            matches[product] = matching
+    return matches
+
+
+class RasterCatalog:
+    """
+    In-memory index of the SNODAS COGs in the raster db, mapping
+    each (date, product) to the paths of its COGs.
+
+    The catalog is built on first use by scanning the date directories
+    under cogs/, and on each later use only rescans what may have
+    changed: every directory that has changed if cogs/ itself has
+    changed (i.e., a date was added or removed), otherwise only those
+    dates that were missing products when last scanned, as they may
+    still have been being imported.
+
+    Given a complete manifest, the catalog is first loaded from it,
+    so it need not scan any directories that have not since changed.
+    """
+
+    def __init__(
+        self: Self,
+        cogs: Path,
+        manifest: RasterManifest | None = None,
+    ) -> None:
+        self.cogs = cogs
+        self.manifest = manifest
+        self._paths: dict[tuple[date, Product], list[Path]] = {}
+        self._dir_mtimes: dict[date, int] = {}
+        self._incomplete: set[date] = set()
+        self._cogs_mtime: int | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self: Self) -> int:
+        return len(self._paths)
+
+    def refresh(self: Self, force: bool = False) -> None:
+        with self._lock:
+            if self._cogs_mtime is None and not force and self.manifest is not None:
+                self._load_manifest(self.manifest)
+
+            cogs_mtime = self.cogs.stat().st_mtime_ns
+
+            if force or cogs_mtime != self._cogs_mtime:
+                self._scan_all(force=force)
+                self._cogs_mtime = cogs_mtime
+            else:
+                for date_ in list(self._incomplete):
+                    path = self.cogs / date_.strftime(DATE_FORMAT)
+                    try:
+                        mtime = path.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        mtime = None
+                    if mtime != self._dir_mtimes.get(date_):
+                        self._scan_date(date_, path)
+
+    def refresh_date(self: Self, date_: date) -> None:
+        """Rescan the directory of one date, e.g., after importing it."""
+        with self._lock:
+            self._scan_date(date_, self.cogs / date_.strftime(DATE_FORMAT))
+
+    def paths(self: Self, date_: date, product: Product) -> list[Path]:
+        return self._paths.get((date_, product), [])
+
+    def paths_from_query(
+        self: Self,
+        query: types.DateQuery,
+        product: Product,
+    ) -> Iterator[Path]:
+        self.refresh()
+        for date_ in query.generate_sequence():
+            matching_files = self.paths(date_, product)
+
+            if len(matching_files) < 1:
+                continue
+            if len(matching_files) > 1:
+                raise RuntimeError(
+                    'Found mutliple files matching date / product '
+                    f"'{date_}' / '{product.value}': {matching_files}",
+                )
+
+            yield matching_files[0]
+
+    def _load_manifest(self: Self, manifest: RasterManifest) -> None:
+        # an incomplete manifest does not record the cogs/ mtime,
+        # so we fall through to scanning everything
+        cogs_mtime = manifest.cogs_mtime()
+        if cogs_mtime is None:
+            return
+
+        paths: dict[date, dict[Product, list[Path]]] = {
+            date_: {} for date_ in manifest.dir_mtimes()
+        }
+        for entry in manifest.entries():
+            paths[entry.date].setdefault(entry.product, []).append(entry.path)
+
+        for date_, mtime in manifest.dir_mtimes().items():
+            self._add_date(date_, mtime, paths[date_])
+        self._cogs_mtime = cogs_mtime
+
+    def _scan_all(self: Self, force: bool) -> None:
+        seen: set[date] = set()
+
+        with os.scandir(self.cogs) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+
+                try:
+                    date_ = datetime.strptime(entry.name, DATE_FORMAT).date()  # noqa: DTZ007
+                except ValueError:
+                    continue
+
+                seen.add(date_)
+                if force or self._dir_mtimes.get(date_) != entry.stat().st_mtime_ns:
+                    self._scan_date(date_, Path(entry.path))
+
+        for date_ in set(self._dir_mtimes) - seen:
+            self._drop_date(date_)
+
+    def _scan_date(self: Self, date_: date, path: Path) -> None:
+        self._drop_date(date_)
+
+        try:
+            mtime = path.stat().st_mtime_ns
+            names = [entry.name for entry in os.scandir(path)]
+        except FileNotFoundError:
+            return
+
+        self._add_date(
+            date_,
+            mtime,
+            {
+                product: [path / name for name in matching]
+                for product, matching in match_products(names).items()
+            },
+        )
+
+    def _add_date(
+        self: Self,
+        date_: date,
+        mtime: int,
+        paths: dict[Product, list[Path]],
+    ) -> None:
+        self._dir_mtimes[date_] = mtime
+        for product in Product:
+            if paths.get(product):
+                self._paths[(date_, product)] = paths[product]
+            else:
+                self._incomplete.add(date_)
+
+    def _drop_date(self: Self, date_: date) -> None:
+        self._dir_mtimes.pop(date_, None)
+        self._incomplete.discard(date_)
+        for product in Product:
+            self._paths.pop((date_, product), None)
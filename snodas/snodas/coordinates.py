@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Self
 
+import numpy
+import numpy.typing
+
 from area import ring__area
 from osgeo import gdal, ogr
 
@@ -11,14 +15,20 @@ from snodas.snodas.constants import (
     ORIGIN_X,
     ORIGIN_Y,
     PX_SIZE,
+    ROWS,
     TILE_NATIVE_ZOOM,
     TILE_SIZE,
 )
 
 gdal.UseExceptions()
 
+# quadkeys memoized per process; well above the tiles intersected by all AOIs
+QUADKEY_CACHE_SIZE = 65536
+
+QUADKEY_DIGITS = '0123'
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class LatLon:
     lat: float
     lon: float
@@ -29,7 +39,7 @@ class LatLon:
         return Pixel(row=row, col=col)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Pixel:
     row: int
     col: int
@@ -58,7 +68,20 @@ class Pixel:
         return abs(ring__area(self.to_ring()))
 
 
-@dataclass
+def row_areas(rows: int = ROWS) -> numpy.typing.NDArray[numpy.float64]:
+    """The area of a pixel in each row of the SNODAS grid.
+
+    On a lat/lon grid every pixel in a row has the same area, so
+    we only need to calculate one pixel per row, not every pixel.
+    """
+    return numpy.fromiter(
+        (Pixel(row=row, col=0).area() for row in range(rows)),
+        dtype=numpy.float64,
+        count=rows,
+    )
+
+
+@dataclass(frozen=True, slots=True)
 class Tile:
     row: int
     col: int
@@ -67,42 +90,12 @@ class Tile:
 
     @classmethod
     def from_quadkey(cls: type[Self], quadkey: str) -> Self:
-        if len(quadkey) != TILE_NATIVE_ZOOM:
-            raise ValueError(
-                f'Tiles only support native zoom level {TILE_NATIVE_ZOOM}, '
-                f'but quadkey is for zoom level {len(quadkey)}.',
-            )
-
-        row: int = 0
-        col: int = 0
-        for idx, char in enumerate(reversed(quadkey)):
-            mask: int = 1 << idx
-            match char:
-                case '0':
-                    continue
-                case '1':
-                    col |= mask
-                case '2':
-                    row |= mask
-                case '3':
-                    row |= mask
-                    col |= mask
-                case _:
-                    raise ValueError(f'Invalid quadkey: {quadkey}')
-
+        row, col = decode_quadkey(quadkey)
         return cls(row=row, col=col)
 
     @property
     def quadkey(self: Self) -> str:
-        qk: str = ''
-
-        for z_level in range(self.zoom, 0, -1):
-            qk += str(
-                int(bool(self.col & (1 << (z_level - 1))))
-                + int(bool(self.row & (1 << (z_level - 1)))) * 2,
-            )
-
-        return qk
+        return encode_quadkey(self.row, self.col, self.zoom)
 
     def origin(self: Self) -> Pixel:
         return Pixel(
@@ -136,3 +129,105 @@ class Tile:
         poly.AddGeometry(ring)
 
         return poly
+
+
+@lru_cache(maxsize=QUADKEY_CACHE_SIZE)
+def encode_quadkey(row: int, col: int, zoom: int = TILE_NATIVE_ZOOM) -> str:
+    # each digit is the col bit plus twice the row bit of a zoom level
+    return ''.join(
+        QUADKEY_DIGITS[((col >> shift) & 1) | (((row >> shift) & 1) << 1)]
+        for shift in range(zoom - 1, -1, -1)
+    )
+
+
+@lru_cache(maxsize=QUADKEY_CACHE_SIZE)
+def decode_quadkey(quadkey: str) -> tuple[int, int]:
+    """The (row, col) of the tile with quadkey."""
+    if len(quadkey) != TILE_NATIVE_ZOOM:
+        raise ValueError(
+            f'Tiles only support native zoom level {TILE_NATIVE_ZOOM}, '
+            f'but quadkey is for zoom level {len(quadkey)}.',
+        )
+
+    if quadkey.strip(QUADKEY_DIGITS):
+        raise ValueError(f'Invalid quadkey: {quadkey}')
+
+    row: int = 0
+    col: int = 0
+    for char in quadkey:
+        digit = int(char)
+        row = (row << 1) | (digit >> 1)
+        col = (col << 1) | (digit & 1)
+    return row, col
+
+
+def latlons_to_pixels(
+    lats: numpy.typing.ArrayLike,
+    lons: numpy.typing.ArrayLike,
+) -> tuple[numpy.typing.NDArray[numpy.intp], numpy.typing.NDArray[numpy.intp]]:
+    """The (rows, cols) of the pixels containing each lat/lon,
+    as LatLon.to_pixel but for whole arrays at once."""
+    rows = ((ORIGIN_Y - numpy.asarray(lats)) / PX_SIZE).astype(numpy.intp)
+    cols = ((numpy.asarray(lons) - ORIGIN_X) / PX_SIZE).astype(numpy.intp)
+    return rows, cols
+
+
+def pixels_to_tiles(
+    rows: numpy.typing.ArrayLike,
+    cols: numpy.typing.ArrayLike,
+    size: int = TILE_SIZE,
+) -> tuple[numpy.typing.NDArray[numpy.intp], numpy.typing.NDArray[numpy.intp]]:
+    """The (rows, cols) of the tiles containing each pixel,
+    as Pixel.to_tile but for whole arrays at once."""
+    return (
+        numpy.asarray(rows, dtype=numpy.intp) // size,
+        numpy.asarray(cols, dtype=numpy.intp) // size,
+    )
+
+
+def latlons_to_tiles(
+    lats: numpy.typing.ArrayLike,
+    lons: numpy.typing.ArrayLike,
+    size: int = TILE_SIZE,
+) -> tuple[numpy.typing.NDArray[numpy.intp], numpy.typing.NDArray[numpy.intp]]:
+    return pixels_to_tiles(*latlons_to_pixels(lats, lons), size=size)
+
+
+def encode_quadkeys(
+    rows: numpy.typing.ArrayLike,
+    cols: numpy.typing.ArrayLike,
+    zoom: int = TILE_NATIVE_ZOOM,
+) -> list[str]:
+    """The quadkeys of the tiles at each row and col."""
+    rows = numpy.asarray(rows, dtype=numpy.int64).reshape(-1, 1)
+    cols = numpy.asarray(cols, dtype=numpy.int64).reshape(-1, 1)
+    shifts = numpy.arange(zoom - 1, -1, -1, dtype=numpy.int64)
+    digits = ((cols >> shifts) & 1) | (((rows >> shifts) & 1) << 1)
+    chars = (digits + ord('0')).astype(numpy.uint8)
+    return [key.decode() for key in chars.view(f'S{zoom}').ravel()]
+
+
+def decode_quadkeys(
+    quadkeys: Iterable[str],
+) -> tuple[numpy.typing.NDArray[numpy.intp], numpy.typing.NDArray[numpy.intp]]:
+    """The (rows, cols) of the tiles with each quadkey."""
+    quadkeys = list(quadkeys)
+    for quadkey in quadkeys:
+        if len(quadkey) != TILE_NATIVE_ZOOM:
+            raise ValueError(
+                f'Tiles only support native zoom level {TILE_NATIVE_ZOOM}, '
+                f'but quadkey is for zoom level {len(quadkey)}.',
+            )
+        if quadkey.strip(QUADKEY_DIGITS):
+            raise ValueError(f'Invalid quadkey: {quadkey}')
+
+    digits = (
+        numpy.frombuffer(''.join(quadkeys).encode(), dtype=numpy.uint8)
+        .reshape(len(quadkeys), TILE_NATIVE_ZOOM)
+        .astype(numpy.intp)
+    ) - ord('0')
+
+    shifts = numpy.arange(TILE_NATIVE_ZOOM - 1, -1, -1, dtype=numpy.intp)
+    rows = ((digits >> 1) << shifts).sum(axis=1)
+    cols = ((digits & 1) << shifts).sum(axis=1)
+    return rows, cols
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+import numpy
+import numpy.typing
+
+from snodas.snodas.constants import TILE_SIZE
+from snodas.snodas.coordinates import Tile
+from snodas.snodas.raster import load_tile
+from snodas.utils.cache import LRUCache
+from snodas.utils.filesystem import atomic_write
+
+if TYPE_CHECKING:
+    from snodas.snodas.fileinfo import Product, SNODASFileInfo
+
+# a slot for every day of a leap year
+DAYS = 366
+
+# open cube memmaps kept per process
+CUBE_HANDLES = 256
+
+
+class CubeStore:
+    """
+    Secondary store of SNODAS values as per-tile time series, so long
+    date ranges read a few large files rather than a COG per date.
+
+    For each product, year, and tile there is a (366, 256, 256) int16
+    cube, indexed by day of year, as an uncompressed npy file that is
+    memory mapped for reads. Cubes are created as sparse files, so days
+    not yet written take no space. An array per cube records the mtime
+    of the COG each day was written from, or 0 if not written; reads of
+    days not written, or whose COG has since changed, fall back to it.
+
+    Only the tiles given on write are stored, normally those that
+    intersect an AOI in the raster db.
+    """
+
+    def __init__(self: Self, path: Path) -> None:
+        self.path = path
+
+    def _cube_path(self: Self, product: Product, year: int, tile: Tile) -> Path:
+        return self.path / product.value / str(year) / f'{tile.quadkey}.npy'
+
+    @staticmethod
+    def _dates_path(cube_path: Path) -> Path:
+        return cube_path.with_suffix('.dates.npy')
+
+    @staticmethod
+    def _day(date_: date) -> int:
+        return date_.timetuple().tm_yday - 1
+
+    def has(
+        self: Self,
+        product: Product,
+        date_: date,
+        tile: Tile,
+        source_mtime: int,
+    ) -> bool:
+        """Whether the tile on the date was written from
+        the COG as of the given modification time."""
+        cube_path = self._cube_path(product, date_.year, tile)
+        dates = _open_cached(self._dates_path(cube_path))
+        return dates is not None and int(dates[self._day(date_)]) == source_mtime
+
+    def read_tile(
+        self: Self,
+        product: Product,
+        date_: date,
+        tile: Tile,
+        source_mtime: int,
+    ) -> numpy.typing.NDArray[numpy.int16] | None:
+        """A read-only view of the tile on the date, or None if the
+        store does not have it as of the COG's modification time."""
+        if not self.has(product, date_, tile, source_mtime):
+            return None
+
+        cube = _open_cached(self._cube_path(product, date_.year, tile))
+        return cube[self._day(date_)] if cube is not None else None
+
+    def write_tile(
+        self: Self,
+        product: Product,
+        date_: date,
+        tile: Tile,
+        array: numpy.typing.NDArray[numpy.int16],
+        source_mtime: int,
+    ) -> None:
+        cube_path = self._cube_path(product, date_.year, tile)
+        dates_path = self._dates_path(cube_path)
+        cube_path.parent.mkdir(parents=True, exist_ok=True)
+
+        cube = numpy.lib.format.open_memmap(
+            cube_path,
+            mode='r+' if cube_path.exists() else 'w+',
+            dtype=numpy.int16,
+            shape=(DAYS, TILE_SIZE, TILE_SIZE),
+        )
+        cube[self._day(date_)] = array
+        cube.flush()
+        del cube
+
+        # the day is only marked once its data is written,
+        # so an interrupted write is never read back
+        try:
+            # older stores marked days with a bool, which as 1 never
+            # matches a COG mtime, so such days are rewritten on refresh
+            dates = numpy.load(dates_path).astype(numpy.int64)
+        except FileNotFoundError:
+            dates = numpy.zeros(DAYS, dtype=numpy.int64)
+        dates[self._day(date_)] = source_mtime
+
+        with atomic_write(dates_path) as f:
+            numpy.save(f, dates)
+
+    def add_raster(
+        self: Self,
+        fileinfo: SNODASFileInfo,
+        tiles: Iterable[Tile],
+        force: bool = False,
+    ) -> int:
+        """Copy the tiles of a SNODAS COG into the store, skipping
+        tiles already stored from the COG as it is now unless force.
+        Returns the count written."""
+        date_ = fileinfo.datetime.date()
+        source_mtime = fileinfo.path.stat().st_mtime_ns
+        written = 0
+        for tile in tiles:
+            if not force and self.has(fileinfo.product, date_, tile, source_mtime):
+                continue
+
+            self.write_tile(
+                fileinfo.product,
+                date_,
+                tile,
+                load_tile(fileinfo.path, tile),
+                source_mtime,
+            )
+            written += 1
+        return written
+
+
+def _open_cached(path: Path) -> numpy.typing.NDArray | None:
+    try:
+        key = (path, path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    array = _cube_handles.get(key)
+    if array is None:
+        array = numpy.load(path, mmap_mode='r')
+        _cube_handles.put(key, array)
+    return array
+
+
+# keyed by (path, mtime) so that handles are
+# reopened after the file is written to
+_cube_handles: LRUCache[tuple[Path, int], numpy.typing.NDArray] = LRUCache(
+    maxsize=CUBE_HANDLES,
+)
@@ -0,0 +1,114 @@
+import os
+import threading
+
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Self
+
+from osgeo import gdal
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # not available on windows
+    resource = None  # type: ignore
+
+gdal.UseExceptions()
+
+# used when the open file limit is unknown or unlimited
+DEFAULT_MAX_OPEN = 64
+
+# we leave most of the open file limit for everything else in the process
+FD_BUDGET_DIVISOR = 4
+
+
+def default_max_open() -> int:
+    if resource is None:
+        return DEFAULT_MAX_OPEN
+
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return DEFAULT_MAX_OPEN
+
+    return max(1, soft // FD_BUDGET_DIVISOR)
+
+
+class DatasetPool:
+    """Thread-safe LRU pool of open read-only GDAL datasets.
+
+    GDAL datasets cannot be shared between threads, so each handle is
+    lent to one caller at a time, and a new handle is opened when all
+    of those for a path are in use. At most max_open idle handles are
+    kept, closing the least recently used beyond that.
+
+    Handles are keyed by file modification time, so a rewritten file
+    is reopened rather than read through a stale handle. A process
+    forked from one with pooled handles starts with an empty pool.
+    """
+
+    def __init__(self: Self, max_open: int | None = None) -> None:
+        self.max_open = max_open or default_max_open()
+        self._idle: OrderedDict[tuple[Path, int], list[gdal.Dataset]] = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def __len__(self: Self) -> int:
+        return self._idle_count
+
+    @contextmanager
+    def dataset(self: Self, path: Path) -> Iterator[gdal.Dataset]:
+        key = (path, path.stat().st_mtime_ns)
+        ds = self._checkout(key)
+        try:
+            yield ds
+        finally:
+            self._checkin(key, ds)
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._idle.clear()
+            self._idle_count = 0
+
+    def _checkout(self: Self, key: tuple[Path, int]) -> gdal.Dataset:
+        with self._lock:
+            if self._pid != os.getpid():
+                # handles inherited over a fork share file offsets
+                # with the parent, so we must not read through them
+                self._idle.clear()
+                self._idle_count = 0
+                self._pid = os.getpid()
+
+            handles = self._idle.get(key)
+            if handles:
+                self._idle_count -= 1
+                ds = handles.pop()
+                if not handles:
+                    del self._idle[key]
+                return ds
+
+        return gdal.OpenEx(str(key[0]), gdal.OF_RASTER | gdal.OF_READONLY)
+
+    def _checkin(self: Self, key: tuple[Path, int], ds: gdal.Dataset) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(ds)
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+
+            while self._idle_count > self.max_open:
+                oldest = next(iter(self._idle))
+                handles = self._idle[oldest]
+                # dropping the last reference closes the dataset
+                handles.pop(0)
+                self._idle_count -= 1
+                if not handles:
+                    del self._idle[oldest]
+
+
+_dataset_pool = DatasetPool()
+
+
+def get_dataset_pool() -> DatasetPool:
+    return _dataset_pool
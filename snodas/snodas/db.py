@@ -1,7 +1,10 @@
-from collections.abc import Iterator
+import os
+
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import date
 from functools import cache
-from itertools import product
 from pathlib import Path
 from typing import Self
 
@@ -11,19 +14,34 @@ import numpy.typing
 from osgeo import gdal, ogr, osr
 
 from snodas import types
+from snodas.exceptions import IncompleteDateError
 from snodas.snodas import constants
 from snodas.snodas.aoi import AOI
-from snodas.snodas.coordinates import Pixel, Tile
+from snodas.snodas.catalog import RasterCatalog
+from snodas.snodas.coordinates import Pixel, Tile, row_areas
+from snodas.snodas.cube_store import CubeStore
 from snodas.snodas.fileinfo import Product, SNODASFileInfo
 from snodas.snodas.input_rasters import SNODASInputRasterSet
-from snodas.snodas.raster import DEM, AOIRaster, AreaRaster
+from snodas.snodas.manifest import RasterManifest
+from snodas.snodas.raster import (
+    DEM,
+    AOIRaster,
+    AreaRaster,
+    geotransform_type,
+    write_npy_companion,
+)
+from snodas.utils.shared_memory import SharedArray, SharedArrayRef
 
 gdal.UseExceptions()
 
+# band order of the consolidated per-date rasters
+CONSOLIDATED_PRODUCTS: tuple[Product, ...] = tuple(Product)
+
 
 def make_geometry_mask(
     geometry: ogr.Geometry,
     target_raster: gdal.Dataset,
+    all_touched: bool = False,
 ) -> numpy.typing.NDArray[numpy.bool_]:
     f_srs: str = geometry.GetSpatialReference()
 
@@ -55,7 +73,13 @@ def make_geometry_mask(
     g_ds.SetProjection(target_raster.GetProjection())
     g_ds.SetGeoTransform(target_raster.GetGeoTransform())
 
-    gdal.RasterizeLayer(g_ds, (1,), f_layer, burn_values=(1,))
+    gdal.RasterizeLayer(
+        g_ds,
+        (1,),
+        f_layer,
+        burn_values=(1,),
+        options=['ALL_TOUCHED=TRUE'] if all_touched else [],
+    )
 
     band: gdal.Band = g_ds.GetRasterBand(1)
     array: numpy.typing.NDArray[numpy.int8] | None = band.ReadAsArray()
@@ -71,6 +95,51 @@ def make_geometry_mask(
     return array.astype(bool)
 
 
+def intersected_tiles(
+    geometry: ogr.Geometry,
+    start_tile: Tile,
+    end_tile: Tile,
+) -> list[Tile]:
+    """The tiles from start_tile to end_tile that intersect geometry,
+    in row-major order.
+
+    Rather than testing each tile's polygon against the geometry,
+    the geometry is rasterized onto a grid of one pixel per tile,
+    marking every tile it touches, so all tiles are tested at once.
+    """
+    origin_latlon = start_tile.origin().to_latlon()
+    tile_size = start_tile.size * constants.PX_SIZE
+
+    mem_driver: gdal.Driver = gdal.GetDriverByName('MEM')
+    tile_grid: gdal.Dataset = mem_driver.Create(
+        '',
+        end_tile.col - start_tile.col + 1,
+        end_tile.row - start_tile.row + 1,
+        1,
+        gdal.GDT_Byte,
+    )
+    tile_grid.SetGeoTransform(
+        (
+            origin_latlon.lon,
+            tile_size,
+            0,
+            origin_latlon.lat,
+            0,
+            -tile_size,
+        ),
+    )
+    tile_grid.SetProjection(geometry.GetSpatialReference().ExportToWkt())
+
+    mask = make_geometry_mask(geometry, tile_grid, all_touched=True)
+    del tile_grid
+
+    rows, cols = numpy.nonzero(mask)
+    return [
+        Tile(row=start_tile.row + int(row), col=start_tile.col + int(col))
+        for row, col in zip(rows, cols, strict=True)
+    ]
+
+
 def write_aoi_raster(
     path: Path,
     aoi: AOI,
@@ -112,10 +181,7 @@ def write_aoi_raster(
 
     masked = numpy.where(
         aoi_mask,
-        dem.array[
-            origin.row : antiorigin.row,
-            origin.col : antiorigin.col,
-        ],
+        dem.window(origin, antiorigin),
         dem.nodata,
     )
 
@@ -158,6 +224,11 @@ class RasterDatabase:
         self.path = path
         self._aoi_rasters = self.path / 'aoi-rasters'
         self._cogs = self.path / 'cogs'
+        self._zonal_stats = self.path / 'zonal-stats'
+        self._cubes = self.path / 'cubes'
+        self._consolidated = self.path / 'consolidated'
+        self.manifest = RasterManifest(self.path / 'manifest.sqlite', self._cogs)
+        self.catalog = RasterCatalog(self._cogs, manifest=self.manifest)
         self._area_raster = self.path / 'areas.tif'
         self._dem = self.path / 'dem.tif'
 
@@ -176,13 +247,18 @@ class RasterDatabase:
         path: Path,
         input_dem_path: Path,
         force: bool = False,
+        npy_companions: bool = False,
     ) -> Self:
+        """Create the raster db at path. With npy_companions, the DEM
+        also gets an uncompressed npy companion, which is memory
+        mapped in place of decoding the DEM (see DEM.open)."""
         self = cls(path)
 
         try:
             self.path.mkdir(exist_ok=force)
             self._aoi_rasters.mkdir(exist_ok=force)
             self._cogs.mkdir(exist_ok=force)
+            self._zonal_stats.mkdir(exist_ok=force)
             self.make_area_raster(force=force)
             self.create_resampled_dem(input_dem_path, force=force)
         except FileExistsError as e:
@@ -191,11 +267,22 @@ class RasterDatabase:
                 'Remove and try again or use `force=True`.',
             ) from e
 
+        if npy_companions:
+            self.write_npy_companions()
+
         return self
 
+    def write_npy_companions(self: Self) -> None:
+        # the area raster is only read for its row areas,
+        # so only the DEM is worth a companion
+        write_npy_companion(self._dem)
+
     def area_raster(self: Self) -> AreaRaster:
         return AreaRaster(self._area_raster)
 
+    def dem(self: Self, window: tuple[Pixel, Pixel] | None = None) -> DEM:
+        return DEM.open(self._dem, window=window)
+
     def make_area_raster(self: Self, force: bool = False) -> None:
         if not force and self._area_raster.exists():
             raise FileExistsError(
@@ -204,13 +291,8 @@ class RasterDatabase:
                 'Remove and try again or use `force=True`.',
             )
 
-        area_array = numpy.fromiter(
-            (
-                Pixel(row=x, col=y).area()
-                for x, y in product(range(constants.ROWS), range(constants.COLS))
-            ),
-            dtype=numpy.float32,
-        ).reshape(constants.ROWS, constants.COLS)
+        area_array = numpy.empty((constants.ROWS, constants.COLS), dtype=numpy.float32)
+        area_array[:] = row_areas(constants.ROWS)[:, numpy.newaxis]
 
         srs = osr.SpatialReference()
         srs.ImportFromEPSG(4326)
@@ -312,20 +394,66 @@ class RasterDatabase:
         query: types.DateQuery,
         product: Product,
     ) -> Iterator[Path]:
-        for date_ in query.generate_sequence():
-            matching_files = list(
-                (self._cogs / self._format_date(date_)).glob(product.to_glob()),
+        yield from self.catalog.paths_from_query(query, product)
+
+    def consolidated_raster_path(self: Self, date_: date) -> Path:
+        return self._consolidated / f'{self._format_date(date_)}.tif'
+
+    @staticmethod
+    def consolidated_band(product: Product) -> int:
+        return CONSOLIDATED_PRODUCTS.index(product) + 1
+
+    def consolidate_snodas_rasters(
+        self: Self,
+        date_: date,
+        force: bool = False,
+    ) -> Path:
+        """Combine the product COGs of a date into one COG with a band per
+        product, in CONSOLIDATED_PRODUCTS order. The bands are pixel
+        interleaved, so a tile of every product is one block read.
+
+        Raises IncompleteDateError if the date does not have exactly
+        one COG of every product."""
+        output_path = self.consolidated_raster_path(date_)
+        if not force and output_path.exists():
+            raise FileExistsError(
+                f'Unable to write consolidated raster: {output_path} already exists. '
+                'Remove file and try again or use `force=True`.',
             )
 
-            if len(matching_files) < 1:
-                continue
-            if len(matching_files) > 1:
-                raise RuntimeError(
-                    'Found mutliple files matching date / product '
-                    f"'{date_}' / '{product.value}': {matching_files}",
+        date_dir = self._cogs / self._format_date(date_)
+        paths: list[str] = []
+        for product in CONSOLIDATED_PRODUCTS:
+            matching_files = list(date_dir.glob(product.to_glob()))
+            if len(matching_files) != 1:
+                raise IncompleteDateError(
+                    f'Expected one file for date / product '
+                    f"'{date_}' / '{product.value}', found: {matching_files}",
                 )
+            paths.append(str(matching_files[0]))
 
-            yield matching_files[0]
+        vrt: gdal.Dataset = gdal.BuildVRT('', paths, separate=True)
+        for band_number, product in enumerate(CONSOLIDATED_PRODUCTS, start=1):
+            vrt.GetRasterBand(band_number).SetDescription(product.value)
+
+        self._consolidated.mkdir(exist_ok=True)
+        gdal.Translate(
+            output_path,
+            vrt,
+            format='COG',
+            stats=True,
+            creationOptions={
+                'BLOCKSIZE': constants.TILE_SIZE,
+                'INTERLEAVE': 'PIXEL',
+                'RESAMPLING': 'AVERAGE',
+                'PREDICTOR': 2,
+                'COMPRESS': 'DEFLATE',
+                'LEVEL': 12,
+            },
+        )
+        del vrt
+
+        return output_path
 
     def aoi_raster_path_from_triplet(
         self: Self,
@@ -333,7 +461,22 @@ class RasterDatabase:
     ) -> Path:
         return self._aoi_rasters / f'{station_triplet.replace(":", "_")}.tif'
 
-    def rasterize_aoi(self, aoi: AOI, force: bool = False) -> AOIRaster:
+    def zonal_stats_store_path(
+        self: Self,
+        station_triplet: types.StationTriplet,
+        elevation_band_step_feet: int,
+    ) -> Path:
+        return (
+            self._zonal_stats
+            / f'{station_triplet.replace(":", "_")}.step-{elevation_band_step_feet}'
+        )
+
+    def rasterize_aoi(
+        self: Self,
+        aoi: AOI,
+        force: bool = False,
+        dem: DEM | None = None,
+    ) -> AOIRaster:
         path = self.aoi_raster_path_from_triplet(aoi.station_triplet)
         if not force and path.exists():
             raise FileExistsError(
@@ -343,22 +486,21 @@ class RasterDatabase:
 
         ul_tile, br_tile = aoi.to_tile_extent()
 
-        intersected: dict[str, str] = {}
-        index: int = 0
-        for tile_row in range(ul_tile.row, br_tile.row + 1):
-            for tile_col in range(ul_tile.col, br_tile.col + 1):
-                tile = Tile(row=tile_row, col=tile_col)
-                geom = tile.to_geom()
-                if geom.Intersects(aoi.geometry):
-                    intersected[f'{constants.TILE_PREFIX}_{str(index).zfill(3)}'] = (
-                        tile.quadkey
-                    )
-                    index += 1
+        intersected: dict[str, str] = {
+            f'{constants.TILE_PREFIX}_{str(index).zfill(3)}': tile.quadkey
+            for index, tile in enumerate(
+                intersected_tiles(aoi.geometry, ul_tile, br_tile),
+            )
+        }
+
+        if dem is None:
+            # only the part of the DEM within the AOI tiles
+            dem = self.dem(window=(ul_tile.origin(), br_tile.antiorigin()))
 
         write_aoi_raster(
             path,
             aoi,
-            DEM.open(self._dem),
+            dem,
             ul_tile,
             br_tile,
             intersected,
@@ -366,10 +508,56 @@ class RasterDatabase:
 
         return AOIRaster.open(path)
 
+    def rasterize_aois(
+        self: Self,
+        aois: Iterable[AOI],
+        force: bool = False,
+        max_workers: int | None = None,
+    ) -> Iterator[tuple[types.StationTriplet, Exception | None]]:
+        """Rasterize many AOIs through a process pool, yielding each
+        station triplet as it is done, with the error if it failed.
+
+        The whole DEM is read once and shared with the workers via
+        shared memory, rather than each AOI reading its own window,
+        unless it has an npy companion each worker can map itself.
+        """
+        dem = self.dem()
+        # a memory mapped DEM is already shared via the page cache
+        shared = (
+            None
+            if isinstance(dem.array, numpy.memmap)
+            else SharedArray.from_array(dem.array)
+        )
+        with (
+            shared or nullcontext(),
+            ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_rasterize_worker,
+                initargs=(
+                    self.path,
+                    shared.ref if shared is not None else None,
+                    dem.datatype,
+                    dem.geotransform,
+                    dem.srs,
+                    dem.nodata,
+                ),
+            ) as executor,
+        ):
+            # the parent copy is no longer needed once shared
+            del dem
+            futures = {
+                executor.submit(_rasterize_worker, aoi, force): aoi.station_triplet
+                for aoi in aois
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
+
     def import_snodas_rasters(
         self: Self,
         rasters: SNODASInputRasterSet,
         force: bool = False,
+        cube_store: bool = False,
+        consolidate: bool = False,
     ) -> None:
         output_dir = self._cogs / self._format_date(rasters.date)
 
@@ -382,17 +570,89 @@ class RasterDatabase:
                 'Remove directory and try again, or use `force=True`.',
             ) from e
 
-        for raster in rasters:
-            raster.write_cog(output_dir=output_dir, force=force)
+        cog_paths = [
+            raster.write_cog(output_dir=output_dir, force=force) for raster in rasters
+        ]
+        self.manifest.record_date(rasters.date)
+        self.catalog.refresh_date(rasters.date)
+
+        if consolidate:
+            self.consolidate_snodas_rasters(rasters.date, force=force)
+
+        if cube_store:
+            cubes = self.cube_store()
+            tiles = self.aoi_tiles()
+            for path in cog_paths:
+                cubes.add_raster(SNODASFileInfo(path), tiles, force=True)
 
     def aoi_rasters(self: Self) -> Iterator[AOIRaster]:
         yield from (AOIRaster.open(path) for path in self._aoi_rasters.glob('*.tif'))
 
+    def aoi_tiles(self: Self) -> list[Tile]:
+        """The tiles intersected by any AOI, read
+        from the AOI raster metadata alone."""
+        tiles: dict[str, Tile] = {}
+        for path in self._aoi_rasters.glob('*.tif'):
+            ds: gdal.Dataset = gdal.Open(path)
+            for key, quadkey in ds.GetMetadata().items():
+                if key.startswith(constants.TILE_PREFIX) and quadkey not in tiles:
+                    tiles[quadkey] = Tile.from_quadkey(quadkey)
+            del ds
+        return list(tiles.values())
+
+    def cube_store(self: Self) -> CubeStore:
+        return CubeStore(self._cubes)
+
     def snodas_rasters(self: Self) -> Iterator[SNODASFileInfo]:
-        for date_dir in self._cogs.iterdir():
-            yield from (SNODASFileInfo(path) for path in date_dir.glob('*.tif'))
+        with os.scandir(self._cogs) as entries:
+            date_dirs = [Path(entry.path) for entry in entries if entry.is_dir()]
+
+        for date_dir in date_dirs:
+            yield from SNODASFileInfo.from_directory(date_dir, '.tif')
 
 
 @cache
 def get_raster_database(path: Path) -> RasterDatabase:
     return RasterDatabase(path).validate()
+
+
+# per-process state for rasterize_aois workers, set by _init_rasterize_worker
+_worker_raster_db: RasterDatabase | None = None
+_worker_dem: DEM | None = None
+_worker_dem_array: SharedArray | None = None
+
+
+def _init_rasterize_worker(
+    raster_db_path: Path,
+    dem_ref: SharedArrayRef | None,
+    datatype: int,
+    geotransform: geotransform_type,
+    srs: str,
+    nodata: float,
+) -> None:
+    global _worker_raster_db, _worker_dem, _worker_dem_array
+
+    _worker_raster_db = get_raster_database(raster_db_path)
+
+    if dem_ref is None:
+        _worker_dem = _worker_raster_db.dem()
+        return
+
+    # we hold a reference to the shared array so it
+    # stays attached for the lifetime of the worker
+    _worker_dem_array = SharedArray.attach(dem_ref)
+    _worker_dem = DEM(
+        array=_worker_dem_array.array,
+        datatype=datatype,
+        geotransform=geotransform,
+        srs=srs,
+        nodata=nodata,
+        origin=Pixel(row=0, col=0),
+    )
+
+
+def _rasterize_worker(aoi: AOI, force: bool) -> None:
+    if _worker_raster_db is None or _worker_dem is None:
+        raise RuntimeError('AOI rasterize worker was not initialized')
+
+    _worker_raster_db.rasterize_aoi(aoi, force=force, dem=_worker_dem)
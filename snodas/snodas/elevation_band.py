@@ -1,6 +1,13 @@
-from collections.abc import Iterator
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from typing import Any, Self, overload
+from itertools import pairwise
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self, overload
+
+import numpy
+import numpy.typing
 
 from snodas.snodas.constants import (
     DEM_MAX_M,
@@ -8,6 +15,13 @@ from snodas.snodas.constants import (
     FT_TO_M,
     M_TO_FT,
 )
+from snodas.utils.cache import LRUCache
+from snodas.utils.filesystem import atomic_write
+
+if TYPE_CHECKING:
+    from snodas.snodas.raster import AOIRasterWithArea
+
+BAND_INDEX_CACHE_SIZE = 32
 
 
 @dataclass
@@ -95,3 +109,137 @@ class ElevationBand:
                 cls(min=(idx * size_ft), max=((idx + 1) * size_ft))
                 for idx in range(start, end)
             )
+
+
+@dataclass
+class ElevationBandIndex:
+    """
+    Index of each pixel of an elevation array into a tuple of
+    contiguous elevation bands, such that all bands can be reduced
+    in a single pass (i.e., with numpy.bincount) instead of building
+    a mask per band. Pixels not within any band have an index of -1.
+
+    The total pixel area within each band is kept alongside the index.
+    """
+
+    bands: tuple[ElevationBand, ...]
+    array: numpy.typing.NDArray[numpy.intp]
+    area: numpy.typing.NDArray[numpy.float64]
+
+    def __len__(self: Self) -> int:
+        return len(self.bands)
+
+    @classmethod
+    def from_elevations(
+        cls: type[Self],
+        elevations: numpy.typing.NDArray[Any],
+        areas: numpy.typing.NDArray[Any],
+        bands: Iterable[ElevationBand],
+    ) -> Self:
+        bands = tuple(sorted(bands))
+
+        for lower, upper in pairwise(bands):
+            if lower.max != upper.min:
+                raise ValueError(
+                    f'Elevation bands are not contiguous: {lower} / {upper}',
+                )
+
+        # we compare in the elevation dtype so pixels on a band
+        # edge are binned the same as `elevations >= band.min_meters`
+        dtype = (
+            elevations.dtype
+            if numpy.issubdtype(elevations.dtype, numpy.floating)
+            else numpy.float64
+        )
+        edges = numpy.array(
+            [band.min_meters for band in bands] + [bands[-1].max_meters],
+            dtype=dtype,
+        )
+        array = numpy.searchsorted(edges, elevations, side='right') - 1
+        array[array >= len(bands)] = -1
+
+        selection = array >= 0
+        area = numpy.bincount(
+            array[selection],
+            weights=areas[selection],
+            minlength=len(bands),
+        )
+
+        return cls(bands=bands, array=array, area=area)
+
+    @classmethod
+    def for_aoi(
+        cls: type[Self],
+        aoi: AOIRasterWithArea,
+        size_ft: int,
+        persist: bool = False,
+    ) -> Self:
+        """
+        Get the band index of the in-polygon pixels of an AOI
+        (see AOIPixels) for elevation bands of size_ft.
+
+        Indexes are cached in memory, keyed by the AOI raster path and
+        stored with its modification time, so a rewritten AOI raster is
+        reindexed and its index replaces the stale one. With
+        persist, indexes are also saved beside the AOI raster so they
+        survive across processes and restarts.
+        """
+        mtime = aoi.path.stat().st_mtime_ns
+        key = (aoi.path, size_ft)
+        cached = _band_index_cache.get(key)
+
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        bands = tuple(ElevationBand.generate(size_ft=size_ft))
+        path = cls._persisted_path(aoi.path, size_ft)
+
+        index = cls._load(path, bands, len(aoi.pixels), mtime) if persist else None
+
+        if index is None:
+            index = cls.from_elevations(
+                aoi.pixels.elevation,
+                aoi.pixels.area,
+                bands,
+            )
+            if persist:
+                index._save(path)
+
+        _band_index_cache.put(key, (mtime, index))
+        return index
+
+    @staticmethod
+    def _persisted_path(aoi_path: Path, size_ft: int) -> Path:
+        return aoi_path.with_name(f'{aoi_path.stem}.bands-{size_ft}.npz')
+
+    @classmethod
+    def _load(
+        cls: type[Self],
+        path: Path,
+        bands: tuple[ElevationBand, ...],
+        pixels: int,
+        aoi_mtime: int,
+    ) -> Self | None:
+        try:
+            if path.stat().st_mtime_ns < aoi_mtime:
+                return None
+
+            with numpy.load(path) as npz:
+                array = npz['array'].astype(numpy.intp)
+                area = npz['area']
+        except (OSError, KeyError, ValueError):
+            return None
+
+        if len(area) != len(bands) or array.shape != (pixels,):
+            return None
+
+        return cls(bands=bands, array=array, area=area)
+
+    def _save(self: Self, path: Path) -> None:
+        with atomic_write(path) as f:
+            numpy.savez(f, array=self.array.astype(numpy.int32), area=self.area)
+
+
+_band_index_cache: LRUCache[tuple[Path, int], tuple[int, ElevationBandIndex]] = (
+    LRUCache(maxsize=BAND_INDEX_CACHE_SIZE)
+)
@@ -1,12 +1,15 @@
+import os
 import re
 
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from enum import StrEnum
+from functools import lru_cache
 from pathlib import Path
-from typing import ClassVar, Self
+from typing import TYPE_CHECKING, Self
 
-from snodas.snodas.raster import SNODASRaster
+if TYPE_CHECKING:
+    from snodas.snodas.raster import SNODASRaster
 
 
 class Region(StrEnum):
@@ -134,62 +137,126 @@ class Product(StrEnum):
         return _units[self.value]
 
 
-class BaseFileInfo:
-    regex: ClassVar[re.Pattern[str]] = re.compile(
-        r'^'
-        r'(?P<region>[a-z]{2})_'
-        r'(?P<model>[a-z]{3})'
-        r'(?P<datatype>v\d)'
-        r'(?P<product_code>\d{4})'
-        r'(?P<scaled>S?)'
-        r'(?P<vcode>[a-zA-Z]{2}[\d_]{2})'
-        r'[AT](?P<timecode>00(01|24))'
-        r'TTNATS'
-        r'(?P<year>\d{4})'
-        r'(?P<month>\d{2})'
-        r'(?P<day>\d{2})'
-        r'(?P<hour>\d{2})'
-        r'(?P<interval>H|D)'
-        r'(?P<offset>P00[01])'
-        r'$',
-    )
-
-    def __init__(self: Self, path: Path) -> None:
-        self.path = path
-        self.name = self.path.stem
-        info = self._match(self.name).groupdict()
-
-        try:
-            self.region = Region(info['region'])
-            self.model = Model(info['model'])
-            self.datatype = Datatype(info['datatype'])
-            self.scaled = bool(info['scaled'])
-            self.vcode: str = info['vcode']
-            self.timecode = Timecode(info['timecode'])
-            self.datetime = datetime(
+FILENAME_REGEX = re.compile(
+    r'^'
+    r'(?P<region>[a-z]{2})_'
+    r'(?P<model>[a-z]{3})'
+    r'(?P<datatype>v\d)'
+    r'(?P<product_code>\d{4})'
+    r'(?P<scaled>S?)'
+    r'(?P<vcode>[a-zA-Z]{2}[\d_]{2})'
+    r'[AT](?P<timecode>00(01|24))'
+    r'TTNATS'
+    r'(?P<year>\d{4})'
+    r'(?P<month>\d{2})'
+    r'(?P<day>\d{2})'
+    r'(?P<hour>\d{2})'
+    r'(?P<interval>H|D)'
+    r'(?P<offset>P00[01])'
+    r'$',
+)
+
+# parsed file names memoized per process; a few decades of every product
+FILENAME_CACHE_SIZE = 1 << 17
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedName:
+    region: Region
+    model: Model
+    datatype: Datatype
+    scaled: bool
+    vcode: str
+    timecode: Timecode
+    datetime: datetime
+    interval: Interval
+    offset: Offset
+    product: Product
+
+
+@lru_cache(maxsize=FILENAME_CACHE_SIZE)
+def parse_name(name: str) -> ParsedName:
+    """Parse a SNODAS file name, without its extension(s)."""
+    match = FILENAME_REGEX.match(name)
+    if not match:
+        raise ValueError('unable to parse SNODAS file path')
+    info = match.groupdict()
+
+    try:
+        return ParsedName(
+            region=Region(info['region']),
+            model=Model(info['model']),
+            datatype=Datatype(info['datatype']),
+            scaled=bool(info['scaled']),
+            vcode=info['vcode'],
+            timecode=Timecode(info['timecode']),
+            datetime=datetime(
                 year=int(info['year']),
                 month=int(info['month']),
                 day=int(info['day']),
                 hour=int(info['hour']),
                 tzinfo=UTC,
-            )
-            self.interval = Interval(info['interval'])
-            self.offset = Offset(info['offset'])
-            self.product = Product.from_product_codes(
+            ),
+            interval=Interval(info['interval']),
+            offset=Offset(info['offset']),
+            product=Product.from_product_codes(
                 int(info['product_code']),
-                self.vcode,
-            )
-        except Exception as e:
-            raise ValueError('invalid value in SNODAS file name') from e
+                info['vcode'],
+            ),
+        )
+    except Exception as e:
+        raise ValueError('invalid value in SNODAS file name') from e
+
+
+class BaseFileInfo:
+    __slots__ = (
+        'datatype',
+        'datetime',
+        'interval',
+        'model',
+        'name',
+        'offset',
+        'path',
+        'product',
+        'region',
+        'scaled',
+        'timecode',
+        'vcode',
+    )
+
+    def __init__(self: Self, path: Path) -> None:
+        self.path = path
+        self.name = self.path.stem
+        parsed = parse_name(self.name)
+
+        self.region = parsed.region
+        self.model = parsed.model
+        self.datatype = parsed.datatype
+        self.scaled = parsed.scaled
+        self.vcode = parsed.vcode
+        self.timecode = parsed.timecode
+        self.datetime = parsed.datetime
+        self.interval = parsed.interval
+        self.offset = parsed.offset
+        self.product = parsed.product
 
     @classmethod
-    def _match(cls: type[Self], string: str):
-        match = cls.regex.match(string)
-        if not match:
-            raise ValueError('unable to parse SNODAS file path')
-        return match
+    def from_directory(cls: type[Self], path: Path, suffix: str) -> list[Self]:
+        """Every file in the directory at path with suffix, parsed
+        from the one directory listing without a stat per file."""
+        with os.scandir(path) as entries:
+            return [
+                cls(path / entry.name)
+                for entry in entries
+                if entry.name.endswith(suffix) and not entry.name.startswith('.')
+            ]
 
 
 class SNODASFileInfo(BaseFileInfo):
-    def open(self: Self) -> SNODASRaster:
+    __slots__ = ()
+
+    def open(self: Self) -> 'SNODASRaster':
+        # imported here as raster imports types, which imports this module
+        from snodas.snodas.raster import SNODASRaster
+
         return SNODASRaster(self)
@@ -51,7 +51,7 @@ class SNODASInputRaster(BaseFileInfo):
         self.trim_header(self.path)
         return BytesIO(to_pgraster(GDALRaster(self.path)).hex().encode())
 
-    def write_cog(self: Self, output_dir: Path, force: bool = False) -> None:
+    def write_cog(self: Self, output_dir: Path, force: bool = False) -> Path:
         output_path = output_dir / f'{self.name}.tif'
 
         if not force and output_path.exists():
@@ -74,6 +74,8 @@ class SNODASInputRaster(BaseFileInfo):
             },
         )
 
+        return output_path
+
 
 class SNODASInputRasterSet:
     def __init__(
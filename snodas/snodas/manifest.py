@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+
+from collections.abc import Iterator
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Self
+
+from snodas.snodas.catalog import DATE_FORMAT, match_products
+from snodas.snodas.fileinfo import Product
+
+# readers treat manifests of another schema as absent, and writers
+# drop them and start over as incomplete, so cogs/ is walked until rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+create table if not exists meta (
+    key text primary key,
+    value text not null
+);
+create table if not exists dates (
+    date text primary key,
+    dir_mtime integer not null
+);
+create table if not exists rasters (
+    date text not null,
+    product text not null,
+    name text not null,
+    size integer not null,
+    mtime integer not null,
+    primary key (date, product, name)
+);
+"""
+
+COGS_MTIME = 'cogs_mtime'
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    date: date
+    product: Product
+    path: Path
+    size: int
+    mtime: int
+
+
+class RasterManifest:
+    """
+    SQLite manifest of the SNODAS COGs in the raster db, listing each
+    date and its product COGs with their sizes and mtimes, so readers
+    can know what is in the db without walking the cogs/ directory.
+
+    Each date is recorded in a single transaction as it is imported,
+    so readers only ever see a date with all or none of its COGs.
+    The mtime of cogs/ is recorded only once the manifest is known to
+    be complete, i.e., after a rebuild(); until then, cogs_mtime() is
+    None and the manifest should not be trusted to list every date.
+    """
+
+    def __init__(self: Self, path: Path, cogs: Path) -> None:
+        self.path = path
+        self.cogs = cogs
+
+    def exists(self: Self) -> bool:
+        return self.path.exists()
+
+    def _connect(self: Self) -> closing[sqlite3.Connection]:
+        """Connect to write, first replacing a manifest of another
+        schema, in one transaction so readers never see it half done."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        if conn.execute('pragma user_version').fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript(
+                'begin immediate;'
+                'drop table if exists meta;'
+                'drop table if exists dates;'
+                'drop table if exists rasters;'
+                f'{SCHEMA}'
+                f'pragma user_version = {SCHEMA_VERSION};'
+                'commit;',
+            )
+        return closing(conn)
+
+    def _read(self: Self, sql: str, params: tuple = ()) -> list[tuple] | None:
+        """The rows of a query, or None without a manifest of our schema.
+        The manifest is opened read only, so readers never change it."""
+        if not self.exists():
+            return None
+
+        with closing(
+            sqlite3.connect(
+                f'{self.path.resolve().as_uri()}?mode=ro',
+                uri=True,
+                timeout=30,
+            ),
+        ) as conn:
+            if conn.execute('pragma user_version').fetchone()[0] != SCHEMA_VERSION:
+                return None
+            return conn.execute(sql, params).fetchall()
+
+    def cogs_mtime(self: Self) -> int | None:
+        rows = self._read('select value from meta where key = ?', (COGS_MTIME,))
+        return int(rows[0][0]) if rows else None
+
+    def is_current(self: Self) -> bool:
+        """Whether the manifest is complete and cogs/ has not changed
+        since, so it can be trusted in place of walking cogs/."""
+        cogs_mtime = self.cogs_mtime()
+        return cogs_mtime is not None and cogs_mtime == self.cogs.stat().st_mtime_ns
+
+    def dir_mtimes(self: Self) -> dict[date, int]:
+        rows = self._read('select date, dir_mtime from dates') or []
+        return {date.fromisoformat(date_): mtime for date_, mtime in rows}
+
+    def entries(self: Self) -> Iterator[ManifestEntry]:
+        rows = (
+            self._read(
+                'select date, product, name, size, mtime from rasters '
+                'order by date, product, name',
+            )
+            or []
+        )
+
+        for date_, product, name, size, mtime in rows:
+            _date = date.fromisoformat(date_)
+            yield ManifestEntry(
+                date=_date,
+                product=Product(product),
+                path=self.cogs / _date.strftime(DATE_FORMAT) / name,
+                size=size,
+                mtime=mtime,
+            )
+
+    def record_date(self: Self, date_: date) -> None:
+        """Replace the entries for a date with what is now on disk."""
+        rows = self._scan_date(date_)
+
+        with self._connect() as conn, conn:
+            self._write_date(conn, date_, rows)
+
+            # a complete manifest stays complete
+            if conn.execute(
+                'select 1 from meta where key = ?',
+                (COGS_MTIME,),
+            ).fetchone():
+                self._write_cogs_mtime(conn)
+
+    def rebuild(self: Self) -> int:
+        """Record every date in cogs/, dropping any no longer there,
+        then mark the manifest complete. Returns the count of dates."""
+        cogs_mtime = self.cogs.stat().st_mtime_ns
+        scanned = {date_: self._scan_date(date_) for date_ in self._dates_on_disk()}
+
+        with self._connect() as conn, conn:
+            conn.execute('delete from rasters')
+            conn.execute('delete from dates')
+            for date_, rows in scanned.items():
+                self._write_date(conn, date_, rows)
+            self._write_cogs_mtime(conn, cogs_mtime)
+
+        return len(scanned)
+
+    def _dates_on_disk(self: Self) -> list[date]:
+        dates: list[date] = []
+        with os.scandir(self.cogs) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                try:
+                    dates.append(
+                        datetime.strptime(entry.name, DATE_FORMAT).date(),  # noqa: DTZ007
+                    )
+                except ValueError:
+                    continue
+        return sorted(dates)
+
+    def _scan_date(self: Self, date_: date) -> tuple[int, list[tuple]] | None:
+        path = self.cogs / date_.strftime(DATE_FORMAT)
+        try:
+            dir_mtime = path.stat().st_mtime_ns
+            names = [entry.name for entry in os.scandir(path)]
+        except FileNotFoundError:
+            return None
+
+        rows: list[tuple] = []
+        for product, matching in match_products(names).items():
+            for name in matching:
+                stat = (path / name).stat()
+                rows.append(
+                    (
+                        date_.isoformat(),
+                        product.value,
+                        name,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    ),
+                )
+        return dir_mtime, rows
+
+    @staticmethod
+    def _write_date(
+        conn: sqlite3.Connection,
+        date_: date,
+        scanned: tuple[int, list[tuple]] | None,
+    ) -> None:
+        conn.execute('delete from rasters where date = ?', (date_.isoformat(),))
+        conn.execute('delete from dates where date = ?', (date_.isoformat(),))
+
+        if scanned is None:
+            return
+
+        dir_mtime, rows = scanned
+        conn.execute(
+            'insert into dates (date, dir_mtime) values (?, ?)',
+            (date_.isoformat(), dir_mtime),
+        )
+        conn.executemany(
+            'insert into rasters (date, product, name, size, mtime) '
+            'values (?, ?, ?, ?, ?)',
+            rows,
+        )
+
+    def _write_cogs_mtime(
+        self: Self,
+        conn: sqlite3.Connection,
+        cogs_mtime: int | None = None,
+    ) -> None:
+        if cogs_mtime is None:
+            cogs_mtime = self.cogs.stat().st_mtime_ns
+        conn.execute(
+            'insert or replace into meta (key, value) values (?, ?)',
+            (COGS_MTIME, str(cogs_mtime)),
+        )
@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 
 from dataclasses import dataclass
+from functools import cache, cached_property
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Generic, Self, TypeVar
 
@@ -12,56 +13,284 @@ import numpy.typing
 from osgeo import gdal
 
 from snodas import types
-from snodas.snodas.constants import SNODAS_ORIGIN_TILE, TILE_PREFIX
-from snodas.snodas.coordinates import Pixel, Tile
+from snodas.snodas.constants import SNODAS_ORIGIN_TILE, TILE_PREFIX, TILE_SIZE
+from snodas.snodas.coordinates import Pixel, Tile, row_areas
+from snodas.snodas.dataset_pool import get_dataset_pool
+from snodas.utils.cache import LRUCache
+from snodas.utils.filesystem import atomic_write
 
 if TYPE_CHECKING:
+    from snodas.snodas.cube_store import CubeStore
     from snodas.snodas.fileinfo import SNODASFileInfo
 
 gdal.UseExceptions()
 
 
-def load_tile(path: Path, tile: Tile) -> numpy.typing.NDArray[Any]:
+def _tile_window(ds: gdal.Dataset, tile: Tile) -> tuple[int, int, int, int]:
+    # tiles on the right and bottom edges of the grid extend past
+    # the raster, so we clip the window to the part within it
     origin = tile.origin()
-    ds: gdal.Dataset = gdal.Translate(
-        '/vsimem/inmem.tif',
-        path,
-        bandList=(1,),
-        srcWin=(origin.col, origin.row, tile.size, tile.size),
-        unscale=True,
+    return (
+        origin.col,
+        origin.row,
+        min(tile.size, ds.RasterXSize - origin.col),
+        min(tile.size, ds.RasterYSize - origin.row),
     )
-    band: gdal.Band = ds.GetRasterBand(1)
-    array: numpy.typing.NDArray[Any] | None = band.ReadAsArray()
 
-    if array is None:
-        raise Exception(f'Failed to load tile from {path}: {tile}')
 
-    return array
+def _fill_tile_edges(
+    band: gdal.Band,
+    array: numpy.typing.NDArray[Any],
+    cols: int,
+    rows: int,
+) -> None:
+    nodata: float | None = band.GetNoDataValue()
+    fill = nodata if nodata is not None else 0
+    array[rows:, :] = fill
+    array[:rows, cols:] = fill
+
+
+def load_tile(path: Path, tile: Tile, band: int = 1) -> numpy.typing.NDArray[Any]:
+    with get_dataset_pool().dataset(path) as ds:
+        raster_band: gdal.Band = ds.GetRasterBand(band)
+        col, row, cols, rows = _tile_window(ds, tile)
+        array: numpy.typing.NDArray[Any] | None = raster_band.ReadAsArray(
+            col,
+            row,
+            cols,
+            rows,
+        )
+
+        if array is None:
+            raise Exception(f'Failed to load tile from {path}: {tile}')
+
+        if rows == cols == tile.size:
+            return array
+
+        full = numpy.empty((tile.size, tile.size), dtype=array.dtype)
+        full[:rows, :cols] = array
+        _fill_tile_edges(raster_band, full, cols, rows)
+        return full
+
+
+def read_tile_into(
+    path: Path,
+    tile: Tile,
+    out: numpy.typing.NDArray[Any],
+    band: int = 1,
+) -> numpy.typing.NDArray[Any]:
+    """Like load_tile, but GDAL reads the tile straight
+    into out, a caller-supplied (tile.size, tile.size) array."""
+    with get_dataset_pool().dataset(path) as ds:
+        raster_band: gdal.Band = ds.GetRasterBand(band)
+        col, row, cols, rows = _tile_window(ds, tile)
+
+        if (
+            raster_band.ReadAsArray(col, row, cols, rows, buf_obj=out[:rows, :cols])
+            is None
+        ):
+            raise Exception(f'Failed to load tile from {path}: {tile}')
+
+        if rows != tile.size or cols != tile.size:
+            _fill_tile_edges(raster_band, out, cols, rows)
+
+    return out
+
+
+def read_tile_bands_into(
+    path: Path,
+    tile: Tile,
+    bands: list[int],
+    out: numpy.typing.NDArray[Any],
+) -> numpy.typing.NDArray[Any]:
+    """Read a tile of several bands into out, a (bands, tile.size,
+    tile.size) array, in one read. For a pixel-interleaved raster
+    this fetches and decodes each block once for all the bands."""
+    with get_dataset_pool().dataset(path) as ds:
+        col, row, cols, rows = _tile_window(ds, tile)
+
+        if (
+            ds.ReadAsArray(
+                col,
+                row,
+                cols,
+                rows,
+                buf_obj=out[:, :rows, :cols],
+                band_list=bands,
+            )
+            is None
+        ):
+            raise Exception(f'Failed to load tile from {path}: {tile}')
+
+        if rows != tile.size or cols != tile.size:
+            for idx, band in enumerate(bands):
+                _fill_tile_edges(ds.GetRasterBand(band), out[idx], cols, rows)
+
+    return out
 
 
 T = TypeVar('T', bound=numpy.generic)
 
 
 class TiledRaster(Generic[T]):
-    def __init__(self: Self, path: Path) -> None:
+    def __init__(self: Self, path: Path, band: int = 1) -> None:
         self.path: Path = Path(path)
+        self.band = band
 
         if not self.path.is_file():
             raise TypeError('not a file')
 
     def load_tile(self: Self, tile: Tile) -> numpy.typing.NDArray[T]:
-        array: numpy.typing.NDArray[T] = load_tile(self.path, tile)
+        array: numpy.typing.NDArray[T] = load_tile(self.path, tile, self.band)
         return array
 
+    def read_tile_into(
+        self: Self,
+        tile: Tile,
+        out: numpy.typing.NDArray[T],
+    ) -> numpy.typing.NDArray[T]:
+        return read_tile_into(self.path, tile, out, self.band)
+
 
 class AreaRaster(TiledRaster[numpy.float32]):
     pass
 
 
+@dataclass(frozen=True)
+class RowAreas:
+    """
+    The pixel area of each row of the SNODAS grid.
+
+    This holds the same values as the area raster, which only repeats
+    each row's area along the row, so areas can be had by slicing a
+    small vector rather than reading and decoding area raster tiles.
+    """
+
+    areas: numpy.typing.NDArray[numpy.float32]
+
+    @classmethod
+    def compute(cls: type[Self]) -> Self:
+        # float32 to match the values in the area raster
+        return cls(areas=row_areas().astype(numpy.float32))
+
+    def window(
+        self: Self,
+        origin: Pixel,
+        shape: tuple[int, int],
+    ) -> numpy.typing.NDArray[numpy.float32]:
+        """The area of each pixel of a window of the grid, as a read-only
+        view. Rows past the edge of the grid have an area of 0."""
+        rows = numpy.zeros(shape[0], dtype=numpy.float32)
+        within = self.areas[origin.row : origin.row + shape[0]]
+        rows[: len(within)] = within
+        return numpy.broadcast_to(rows[:, numpy.newaxis], shape)
+
+
+@cache
+def get_row_areas() -> RowAreas:
+    return RowAreas.compute()
+
+
 class SNODASRaster(TiledRaster[numpy.int16]):
-    def __init__(self: Self, fileinfo: SNODASFileInfo) -> None:
-        super().__init__(fileinfo.path)
+    """A SNODAS COG, with decoded tiles kept in the process-wide
+    tile cache so repeated reads of a tile skip decompression.
+
+    Given a cube store, tiles it holds are read from there instead.
+    Given a consolidated raster, the product is read from its band of
+    that multi-band raster rather than from the product's own COG.
+    """
+
+    def __init__(
+        self: Self,
+        fileinfo: SNODASFileInfo,
+        cubes: CubeStore | None = None,
+        consolidated: Path | None = None,
+        band: int = 1,
+    ) -> None:
+        super().__init__(consolidated or fileinfo.path, band)
         self.fileinfo = fileinfo
+        self.cubes = cubes
+
+    def _read_cube_tile(
+        self: Self,
+        tile: Tile,
+    ) -> numpy.typing.NDArray[numpy.int16] | None:
+        if self.cubes is None:
+            return None
+        # a COG rewritten since its tiles were stored is read instead
+        return self.cubes.read_tile(
+            self.fileinfo.product,
+            self.fileinfo.datetime.date(),
+            tile,
+            self.fileinfo.path.stat().st_mtime_ns,
+        )
+
+    def _tile_cache_key(self: Self, tile: Tile) -> tuple[Path, int, int, str]:
+        # the mtime ensures a rewritten COG does not hit stale tiles
+        return (self.path, self.band, self.path.stat().st_mtime_ns, tile.quadkey)
+
+    def load_tile(self: Self, tile: Tile) -> numpy.typing.NDArray[numpy.int16]:
+        cube_tile = self._read_cube_tile(tile)
+        if cube_tile is not None:
+            return cube_tile
+
+        if not _tile_cache.maxbytes:
+            return super().load_tile(tile)
+
+        key = self._tile_cache_key(tile)
+        array = _tile_cache.get(key)
+        if array is None:
+            array = super().load_tile(tile)
+            # cached tiles are shared, so nobody may modify them
+            array.flags.writeable = False
+            _tile_cache.put(key, array)
+        return array
+
+    def read_tile_into(
+        self: Self,
+        tile: Tile,
+        out: numpy.typing.NDArray[numpy.int16],
+    ) -> numpy.typing.NDArray[numpy.int16]:
+        cube_tile = self._read_cube_tile(tile)
+        if cube_tile is not None:
+            out[...] = cube_tile
+            return out
+
+        if not _tile_cache.maxbytes:
+            return super().read_tile_into(tile, out)
+
+        key = self._tile_cache_key(tile)
+        array = _tile_cache.get(key)
+        if array is None:
+            super().read_tile_into(tile, out)
+            array = out.copy()
+            array.flags.writeable = False
+            _tile_cache.put(key, array)
+        else:
+            out[...] = array
+        return out
+
+
+# decoded SNODAS tiles shared by all readers in the process,
+# keyed by (COG path, band, COG mtime, tile quadkey); 0 disables it.
+# parallel zonal stats workers each keep their own, with an equal share
+# of the budget of the server process, which only serial requests use
+TILE_CACHE_BYTES = 256 * 1024 * 1024
+
+TileCache = LRUCache[
+    tuple[Path, int, int, str],
+    numpy.typing.NDArray[numpy.int16],
+]
+
+_tile_cache: TileCache = LRUCache(
+    maxsize=None,
+    maxbytes=TILE_CACHE_BYTES,
+    sizeof=lambda array: array.nbytes,
+)
+
+
+def get_tile_cache() -> TileCache:
+    return _tile_cache
 
 
 @dataclass
@@ -72,6 +301,7 @@ class AOIRaster:
     origin: Pixel
     min_elevation: float
     max_elevation: float
+    nodata: float | None
 
     @property
     def station_triplet(self: Self) -> types.StationTriplet:
@@ -94,6 +324,7 @@ class AOIRaster:
         band: gdal.Band = ds.GetRasterBand(1)
         min_: float = band.GetMinimum()
         max_: float = band.GetMaximum()
+        nodata: float | None = band.GetNoDataValue()
         array: numpy.typing.NDArray[numpy.float32] | None = band.ReadAsArray()
 
         if array is None:
@@ -111,6 +342,7 @@ class AOIRaster:
             origin=origin,
             min_elevation=min_,
             max_elevation=max_,
+            nodata=nodata,
         )
 
     def _load_raster_tile_into_array(
@@ -144,13 +376,17 @@ class AOIRasterWithArea(AOIRaster):
     def from_aoi_raster(
         cls: type[Self],
         aoi_raster: AOIRaster,
-        area_raster: AreaRaster,
+        area_raster: AreaRaster | RowAreas,
     ) -> Self:
-        area = numpy.zeros_like(
-            aoi_raster.array,
-            dtype=numpy.float32,
-        )
-        aoi_raster.load_raster_tiles_into_array(area_raster, area)
+        if isinstance(area_raster, RowAreas):
+            area = area_raster.window(aoi_raster.origin, aoi_raster.array.shape)
+        else:
+            area = numpy.zeros_like(
+                aoi_raster.array,
+                dtype=numpy.float32,
+            )
+            aoi_raster.load_raster_tiles_into_array(area_raster, area)
+
         return cls(
             area=area,
             path=aoi_raster.path,
@@ -159,7 +395,233 @@ class AOIRasterWithArea(AOIRaster):
             origin=aoi_raster.origin,
             min_elevation=aoi_raster.min_elevation,
             max_elevation=aoi_raster.max_elevation,
+            nodata=aoi_raster.nodata,
+        )
+
+    @classmethod
+    def open_cached(cls: type[Self], path: Path) -> Self:
+        """Open the AOI raster at path with its row areas, or get
+        it from the process-wide AOI cache if unchanged on disk.
+
+        Cached AOIs are shared, so must not be modified.
+        """
+        triplet = types.StationTriplet(path.stem.replace('_', ':'))
+        mtime = path.stat().st_mtime_ns
+        cached = _aoi_cache.get(triplet)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        aoi = cls.from_aoi_raster(AOIRaster.open(path), get_row_areas())
+        # built up front so the cache can account for it
+        aoi.pixels  # noqa: B018
+        # replaces any entry for an older version of the raster
+        _aoi_cache.put(triplet, (mtime, aoi))
+        return aoi
+
+    @property
+    def nbytes(self: Self) -> int:
+        # the area is a broadcast view of the row areas, so takes no space
+        nbytes = self.array.nbytes
+        if self.area.base is None:
+            nbytes += self.area.nbytes
+        if 'pixels' in self.__dict__:
+            nbytes += self.pixels.nbytes
+        return nbytes
+
+    @cached_property
+    def pixels(self: Self) -> AOIPixels:
+        return AOIPixels.from_aoi_raster(self)
+
+
+# opened AOI rasters shared by all requests in the process, keyed by
+# station triplet and stored with the AOI raster mtime, so an updated
+# AOI is reopened and replaces its entry
+AOI_CACHE_BYTES = 256 * 1024 * 1024
+
+AOICache = LRUCache[types.StationTriplet, tuple[int, AOIRasterWithArea]]
+
+_aoi_cache: AOICache = LRUCache(
+    maxsize=None,
+    maxbytes=AOI_CACHE_BYTES,
+    sizeof=lambda entry: entry[1].nbytes,
+)
+
+
+def get_aoi_cache() -> AOICache:
+    return _aoi_cache
+
+
+@dataclass
+class AOIPixels:
+    """
+    Compact representation of the pixels within an AOI polygon.
+
+    Rather than the full bounding box of the AOI, only in-polygon
+    pixels are kept, as flat arrays grouped by the tile containing
+    them. The pixels of tiles[i] are those in offsets[i]:offsets[i+1],
+    and tile_index gives the flat index of each pixel within its tile.
+    Tiles without any in-polygon pixels are dropped entirely.
+    """
+
+    tiles: tuple[Tile, ...]
+    offsets: numpy.typing.NDArray[numpy.intp]
+    tile_index: numpy.typing.NDArray[numpy.intp]
+    elevation: numpy.typing.NDArray[numpy.float32]
+    area: numpy.typing.NDArray[numpy.float32]
+
+    def __len__(self: Self) -> int:
+        return len(self.tile_index)
+
+    @property
+    def nbytes(self: Self) -> int:
+        return (
+            self.offsets.nbytes
+            + self.tile_index.nbytes
+            + self.elevation.nbytes
+            + self.area.nbytes
+        )
+
+    @classmethod
+    def from_aoi_raster(cls: type[Self], aoi: AOIRasterWithArea) -> Self:
+        mask = numpy.isfinite(aoi.array)
+        if aoi.nodata is not None:
+            mask &= aoi.array != aoi.nodata
+
+        origin_tile = aoi.origin.to_tile()
+        tile_cols = -(-aoi.array.shape[1] // TILE_SIZE)
+
+        # only pixels in intersected tiles ever get snodas values
+        intersected = numpy.zeros(
+            (-(-aoi.array.shape[0] // TILE_SIZE), tile_cols),
+            dtype=bool,
         )
+        for tile in aoi.intersected_tiles:
+            intersected[tile.row - origin_tile.row, tile.col - origin_tile.col] = True
+
+        rows, cols = numpy.nonzero(mask)
+        tile_ids = (rows // TILE_SIZE) * tile_cols + (cols // TILE_SIZE)
+        in_tiles = intersected.ravel()[tile_ids]
+        rows, cols, tile_ids = rows[in_tiles], cols[in_tiles], tile_ids[in_tiles]
+
+        # sort by tile so each tile's pixels are contiguous
+        order = numpy.argsort(tile_ids, kind='stable')
+        rows, cols, tile_ids = rows[order], cols[order], tile_ids[order]
+        unique_ids, starts = numpy.unique(tile_ids, return_index=True)
+        tile_index = (rows % TILE_SIZE) * TILE_SIZE + (cols % TILE_SIZE)
+
+        return cls(
+            tiles=tuple(
+                Tile(
+                    row=origin_tile.row + int(tile_id) // tile_cols,
+                    col=origin_tile.col + int(tile_id) % tile_cols,
+                )
+                for tile_id in unique_ids
+            ),
+            offsets=numpy.append(starts, len(tile_ids)).astype(numpy.intp),
+            tile_index=tile_index.astype(numpy.intp),
+            elevation=aoi.array[rows, cols],
+            area=aoi.area[rows, cols],
+        )
+
+    def load_raster_values(
+        self: Self,
+        raster: TiledRaster,
+        out: numpy.typing.NDArray[Any],
+        tile_buffer: numpy.typing.NDArray[Any] | None = None,
+    ) -> None:
+        """Gather the raster value of each AOI pixel into out.
+
+        Each tile is read into tile_buffer, if given, to avoid
+        allocating a new array for every tile.
+        """
+        if tile_buffer is None:
+            tile_buffer = numpy.empty((TILE_SIZE, TILE_SIZE), dtype=out.dtype)
+
+        for idx, tile in enumerate(self.tiles):
+            start, end = self.offsets[idx], self.offsets[idx + 1]
+            numpy.take(
+                raster.read_tile_into(tile, tile_buffer).ravel(),
+                self.tile_index[start:end],
+                out=out[start:end],
+                # indexes are always in bounds, and unlike
+                # the default raise mode clip does not buffer
+                mode='clip',
+            )
+
+    def load_rasters_values(
+        self: Self,
+        rasters: list[SNODASRaster],
+        out: numpy.typing.NDArray[Any],
+        tile_buffers: numpy.typing.NDArray[Any] | None = None,
+    ) -> None:
+        """Gather the values of each raster into the matching row of out.
+
+        Rasters that are all bands of one consolidated raster are read
+        together, with one read per tile into tile_buffers, a (rasters,
+        TILE_SIZE, TILE_SIZE) array, if given. Otherwise each raster is
+        read on its own as in load_raster_values.
+        """
+        if tile_buffers is None:
+            tile_buffers = numpy.empty(
+                (len(rasters), TILE_SIZE, TILE_SIZE),
+                dtype=out.dtype,
+            )
+
+        path = rasters[0].path
+        if len(rasters) < 2 or any(
+            raster.path != path or raster.cubes is not None for raster in rasters
+        ):
+            for idx, raster in enumerate(rasters):
+                self.load_raster_values(raster, out[idx], tile_buffers[idx])
+            return
+
+        bands = [raster.band for raster in rasters]
+        for idx, tile in enumerate(self.tiles):
+            start, end = self.offsets[idx], self.offsets[idx + 1]
+            read_tile_bands_into(path, tile, bands, tile_buffers)
+            for band_idx in range(len(bands)):
+                numpy.take(
+                    tile_buffers[band_idx].ravel(),
+                    self.tile_index[start:end],
+                    out=out[band_idx, start:end],
+                    mode='clip',
+                )
+
+
+def npy_companion_path(path: Path) -> Path:
+    return path.with_suffix('.npy')
+
+
+def write_npy_companion(path: Path) -> Path:
+    """Write the first band of the raster at path as an uncompressed
+    npy file alongside it, so it can be memory mapped rather than
+    decoded, with every process sharing the one page cache copy."""
+    ds: gdal.Dataset = gdal.Open(str(path))
+    band: gdal.Band = ds.GetRasterBand(1)
+    array: numpy.typing.NDArray[Any] | None = band.ReadAsArray()
+
+    if array is None:
+        raise Exception(f'Failed to read raster: {path}')
+
+    del band
+    del ds
+
+    npy_path = npy_companion_path(path)
+    with atomic_write(npy_path) as f:
+        numpy.save(f, array)
+    return npy_path
+
+
+def open_npy_companion(path: Path) -> numpy.typing.NDArray[Any] | None:
+    """The npy companion of the raster at path memory mapped, or None
+    if it has none or it is older than the raster (so is stale)."""
+    npy_path = npy_companion_path(path)
+    try:
+        if npy_path.stat().st_mtime_ns < Path(path).stat().st_mtime_ns:
+            return None
+    except FileNotFoundError:
+        return None
+    return numpy.load(npy_path, mmap_mode='r')
 
 
 geotransform_type = tuple[float, float, float, float, float, float]
@@ -172,12 +634,42 @@ class DEM:
     geotransform: geotransform_type
     srs: str
     nodata: float
+    # the DEM pixel of array[0, 0]
+    origin: Pixel
 
     @classmethod
-    def open(cls: type[Self], path: Path) -> Self:
+    def open(
+        cls: type[Self],
+        path: Path,
+        window: tuple[Pixel, Pixel] | None = None,
+    ) -> Self:
+        """Open the DEM at path, reading only the pixels from the origin
+        up to (but not including) the antiorigin of window, if given,
+        rather than the whole DEM. Any part of the window beyond the
+        right or bottom edge of the DEM is filled with nodata.
+
+        If the DEM has an npy companion, the array is a read-only view
+        of it memory mapped, rather than decoded from the GeoTIFF.
+        """
         ds: gdal.Dataset = gdal.Open(str(path))
         band: gdal.Band = ds.GetRasterBand(1)
-        array: numpy.typing.NDArray[numpy.float32] | None = band.ReadAsArray()
+        nodata: float = band.GetNoDataValue()
+        companion = open_npy_companion(path)
+
+        array: numpy.typing.NDArray[numpy.float32] | None
+        if window is None:
+            origin = Pixel(row=0, col=0)
+            array = companion if companion is not None else band.ReadAsArray()
+        else:
+            origin, antiorigin = window
+            array = cls._read_window(
+                ds,
+                band,
+                origin,
+                antiorigin,
+                nodata,
+                companion,
+            )
 
         if array is None:
             raise argparse.ArgumentTypeError(
@@ -187,7 +679,6 @@ class DEM:
         srs: str = ds.GetProjection()
         geotransform: geotransform_type = ds.GetGeoTransform()
         datatype: int = band.DataType
-        nodata: float = band.GetNoDataValue()
 
         del band
         del ds
@@ -198,4 +689,48 @@ class DEM:
             geotransform=geotransform,
             srs=srs,
             nodata=nodata,
+            origin=origin,
         )
+
+    @staticmethod
+    def _read_window(
+        ds: gdal.Dataset,
+        band: gdal.Band,
+        origin: Pixel,
+        antiorigin: Pixel,
+        nodata: float,
+        companion: numpy.typing.NDArray[numpy.float32] | None = None,
+    ) -> numpy.typing.NDArray[numpy.float32] | None:
+        rows = antiorigin.row - origin.row
+        cols = antiorigin.col - origin.col
+        read_rows = min(rows, ds.RasterYSize - origin.row)
+        read_cols = min(cols, ds.RasterXSize - origin.col)
+
+        array: numpy.typing.NDArray[numpy.float32] | None
+        if companion is not None:
+            # a view, so nothing is read until used
+            array = companion[
+                origin.row : origin.row + read_rows,
+                origin.col : origin.col + read_cols,
+            ]
+        else:
+            array = band.ReadAsArray(origin.col, origin.row, read_cols, read_rows)
+
+        if array is None or (read_rows == rows and read_cols == cols):
+            return array
+
+        full = numpy.full((rows, cols), nodata, dtype=array.dtype)
+        full[:read_rows, :read_cols] = array
+        return full
+
+    def window(
+        self: Self,
+        origin: Pixel,
+        antiorigin: Pixel,
+    ) -> numpy.typing.NDArray[numpy.float32]:
+        """The elevations from origin up to antiorigin, which
+        must be within the part of the DEM that was read."""
+        return self.array[
+            origin.row - self.origin.row : antiorigin.row - self.origin.row,
+            origin.col - self.origin.col : antiorigin.col - self.origin.col,
+        ]
@@ -1,5 +1,6 @@
 from collections.abc import Iterator
 from datetime import date
+from pathlib import Path
 from typing import Self
 
 from django.conf import settings
@@ -43,6 +44,15 @@ class RasterCollection:
         for rasters in self._by_product.values():
             yield from rasters
 
+    def by_date(self: Self) -> Iterator[tuple[date, list[SNODASRaster]]]:
+        """Yield the rasters for each date in date order,
+        with each date's rasters in product order."""
+        for date_ in self.dates:
+            yield (
+                date_,
+                sorted(self._by_date[date_], key=lambda x: x.fileinfo.product),
+            )
+
     def __len__(self: Self) -> int:
         return sum(len(rasters) for rasters in self._by_product.values())
 
@@ -53,11 +63,47 @@ class RasterCollection:
         products: set[Product],
     ) -> Self:
         rasterdb = get_raster_database(settings.SNODAS_RASTERDB)
+        cubes = rasterdb.cube_store() if settings.SNODAS_CUBE_STORE else None
+        # the consolidated raster of each date and its mtime, if any
+        consolidated: dict[date, tuple[Path, int] | None] = {}
+
+        def open_raster(path: Path, product: Product) -> SNODASRaster:
+            fileinfo = SNODASFileInfo(path)
+            if not settings.SNODAS_CONSOLIDATED_RASTERS:
+                return SNODASRaster(fileinfo, cubes=cubes)
+
+            date_ = fileinfo.datetime.date()
+            if date_ not in consolidated:
+                consolidated_path = rasterdb.consolidated_raster_path(date_)
+                try:
+                    consolidated[date_] = (
+                        consolidated_path,
+                        consolidated_path.stat().st_mtime_ns,
+                    )
+                except FileNotFoundError:
+                    consolidated[date_] = None
+
+            # a product COG rewritten since the date was consolidated
+            # makes the consolidated raster stale, so we read the COG
+            date_consolidated = consolidated[date_]
+            if (
+                date_consolidated is None
+                or date_consolidated[1] < path.stat().st_mtime_ns
+            ):
+                return SNODASRaster(fileinfo, cubes=cubes)
+
+            return SNODASRaster(
+                fileinfo,
+                cubes=cubes,
+                consolidated=date_consolidated[0],
+                band=rasterdb.consolidated_band(product),
+            )
+
         return cls(
             query=query,
             rasters={
                 product: [
-                    SNODASRaster(SNODASFileInfo(path))
+                    open_raster(path, product)
                     for path in rasterdb.raster_paths_from_query(query, product)
                 ]
                 for product in products
@@ -1,19 +1,130 @@
+import bisect
 import csv
+import multiprocessing
+import os
+import threading
 
-from collections.abc import Iterable
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from datetime import date
-from typing import IO, Self
+from typing import IO, TYPE_CHECKING, Self
 
 import numpy
 import numpy.typing
 
 from snodas import types
-from snodas.snodas.constants import NODATA
-from snodas.snodas.elevation_band import ElevationBand
+from snodas.snodas.constants import NODATA, TILE_SIZE
+from snodas.snodas.coordinates import Tile
+from snodas.snodas.elevation_band import ElevationBand, ElevationBandIndex
 from snodas.snodas.fileinfo import Product
-from snodas.snodas.raster import AOIRasterWithArea, SNODASRaster
+from snodas.snodas.raster import (
+    AOIPixels,
+    AOIRasterWithArea,
+    SNODASRaster,
+    get_tile_cache,
+)
 from snodas.snodas.raster_collection import RasterCollection
+from snodas.utils.shared_memory import SharedArray, SharedArrayRef
+
+if TYPE_CHECKING:
+    from snodas.snodas.zonal_stats_store import ZonalStatsStore
+
+# below this many rasters the cost of starting the process
+# pool outweighs any gains from running in parallel
+PARALLEL_THRESHOLD = 50
+
+# workers are started from a clean process rather than forked from
+# the threaded server, as a fork can inherit locks held by other
+# threads (caches, dataset pools, GDAL) that never get released;
+# either way each worker re-imports __main__, so whatever runs the
+# server must start it behind an `if __name__ == '__main__'` guard
+MP_CONTEXT = multiprocessing.get_context(
+    'forkserver'
+    if 'forkserver' in multiprocessing.get_all_start_methods()
+    else 'spawn',
+)
+if MP_CONTEXT.get_start_method() == 'forkserver':
+    # workers are forked from a server that has already imported
+    # us (and so numpy, django, etc.), so each starts quickly
+    MP_CONTEXT.set_forkserver_preload(['snodas.snodas.zonal_stats'])
+
+# the band step when none is requested, and without a base
+# step the only one besides 0 whose results are persisted
+DEFAULT_STEP_FEET = 1000
+
+# parallel workers by worker count, each in its own single-process
+# pool kept for the life of the process; see _get_worker_pools
+_worker_pools: dict[int, list[ProcessPoolExecutor]] = {}
+_worker_pools_lock = threading.Lock()
+
+# per-process state for parallel workers, set by _attach_worker_aoi
+_worker_aoi: str | None = None
+_worker_pixels: AOIPixels | None = None
+_worker_band_index: ElevationBandIndex | None = None
+_worker_shared: list[SharedArray] = []
+_worker_scratch: 'ScratchBuffers | None' = None
+
+
+class ScratchBuffers:
+    """Arrays reused for every date a process calculates,
+    so that loading each date's rasters allocates nothing."""
+
+    def __init__(self: Self) -> None:
+        self.tile = numpy.empty((TILE_SIZE, TILE_SIZE), dtype=numpy.int16)
+        self._tiles = numpy.empty((0, TILE_SIZE, TILE_SIZE), dtype=numpy.int16)
+        self._stacks: dict[object, numpy.typing.NDArray[numpy.int16]] = {}
+        self._bins: dict[
+            object,
+            tuple[
+                ElevationBandIndex,
+                numpy.typing.NDArray[numpy.bool_],
+                numpy.typing.NDArray[numpy.intp],
+            ],
+        ] = {}
+
+    def tiles(self: Self, count: int) -> numpy.typing.NDArray[numpy.int16]:
+        """A (count, TILE_SIZE, TILE_SIZE) array of tile buffers."""
+        if len(self._tiles) < count:
+            self._tiles = numpy.empty((count, TILE_SIZE, TILE_SIZE), numpy.int16)
+        return self._tiles[:count]
+
+    def stack(
+        self: Self,
+        products: int,
+        pixels: int,
+        key: object = None,
+    ) -> numpy.typing.NDArray[numpy.int16]:
+        """A (products, pixels) array, reused per key while its shape fits."""
+        stack = self._stacks.get(key)
+        if stack is None or stack.shape != (products, pixels):
+            stack = numpy.empty((products, pixels), dtype=numpy.int16)
+            self._stacks[key] = stack
+        return stack
+
+    def bins(
+        self: Self,
+        band_index: ElevationBandIndex,
+        products: int,
+        key: object = None,
+    ) -> tuple[numpy.typing.NDArray[numpy.bool_], numpy.typing.NDArray[numpy.intp]]:
+        """The mask of pixels in a band, and a (products, pixels) array
+        of each product's band indexes offset so that every (product,
+        band) pair has its own bin, reused per key while they fit."""
+        cached = self._bins.get(key)
+        if (
+            cached is None
+            or cached[0] is not band_index
+            or cached[2].shape[0] != products
+        ):
+            in_band = band_index.array >= 0
+            bins = (
+                band_index.array + (numpy.arange(products) * len(band_index))[:, None]
+            )
+            cached = (band_index, in_band, bins)
+            self._bins[key] = cached
+        return cached[1], cached[2]
 
 
 @dataclass
@@ -23,6 +134,111 @@ class Result:
     product: Product
     mean: float
     area: float
+    count: int = 0
+
+
+@dataclass(frozen=True)
+class WorkerAOI:
+    """The AOI pixels and band index of a request as sent to parallel
+    workers, with the arrays in shared memory rather than pickled."""
+
+    tiles: tuple[Tile, ...]
+    offsets: numpy.typing.NDArray[numpy.intp]
+    tile_index: SharedArrayRef
+    area: SharedArrayRef
+    index: SharedArrayRef
+    bands: tuple[ElevationBand, ...]
+    band_areas: numpy.typing.NDArray[numpy.float64]
+
+
+@dataclass
+class BandStats:
+    """The stats of one date's products in each elevation band, as
+    (products, bands) arrays, so they can be stored and merged into
+    coarser bands without first building a Result for each band."""
+
+    date: date
+    products: list[Product]
+    mean: numpy.typing.NDArray[numpy.float64]
+    count: numpy.typing.NDArray[numpy.int64]
+    area: numpy.typing.NDArray[numpy.float64]
+
+    @classmethod
+    def concat(cls: type[Self], stats: list[Self]) -> Self:
+        """Join the stats of different products of the same date."""
+        return cls(
+            date=stats[0].date,
+            products=[product for s in stats for product in s.products],
+            mean=numpy.concatenate([s.mean for s in stats]),
+            count=numpy.concatenate([s.count for s in stats]),
+            area=numpy.concatenate([s.area for s in stats]),
+        )
+
+    def results(self: Self, bands: tuple[ElevationBand, ...]) -> list[Result]:
+        return [
+            Result(
+                date=self.date,
+                elevation_band=band,
+                product=product,
+                mean=mean,
+                area=area,
+                count=count,
+            )
+            for product, means, counts, areas in zip(
+                self.products,
+                self.mean.tolist(),
+                self.count.tolist(),
+                self.area.tolist(),
+                strict=True,
+            )
+            for band, mean, count, area in zip(
+                bands,
+                means,
+                counts,
+                areas,
+                strict=True,
+            )
+        ]
+
+    def merge_bands(
+        self: Self,
+        fine_bands: tuple[ElevationBand, ...],
+        bands: tuple[ElevationBand, ...],
+    ) -> Self:
+        """Merge the stats of the fine bands into the coarser bands,
+        each of which must be made up of whole fine bands.
+
+        Counts and areas are summed, and means are weighted by count,
+        so the merged stats match those calculated for the coarse bands.
+        """
+        groups = _band_groups(fine_bands, bands)
+        products = len(self.products)
+        bins = (numpy.arange(products)[:, None] * len(bands) + groups).ravel()
+
+        def total(
+            values: numpy.typing.NDArray[numpy.generic],
+        ) -> numpy.typing.NDArray[numpy.float64]:
+            return numpy.bincount(
+                bins,
+                weights=values.ravel(),
+                minlength=products * len(bands),
+            ).reshape(products, len(bands))
+
+        count = total(self.count)
+        has_pixels = count > 0
+        sums = total(numpy.where(self.count > 0, self.mean * self.count, 0))
+        return type(self)(
+            date=self.date,
+            products=self.products,
+            mean=numpy.divide(
+                sums,
+                count,
+                out=numpy.full_like(sums, numpy.nan),
+                where=has_pixels,
+            ),
+            count=count.astype(numpy.int64),
+            area=numpy.where(has_pixels, total(self.area), 0),
+        )
 
 
 class ZonalStats:
@@ -100,17 +316,15 @@ class ZonalStats:
             )
         return stats
 
-    def dump_to_csv(self: Self, out: IO) -> None:
-        writer = csv.writer(out, quoting=csv.QUOTE_MINIMAL)
-
+    def csv_header(self: Self) -> list[str]:
         headers: list[str] = ['date']
         for band in self._elevation_bands_index:
             headers.append(f'area_m2_{band}')
             for product in self._products_index:
                 headers.append(f'{product.value}_{product.unit().name}_{band}')
+        return headers
 
-        writer.writerow(headers)
-
+    def csv_rows(self: Self) -> Iterator[list[str]]:
         for date_, date_idx in self._dates_index.items():
             row: list[str] = [date_.isoformat()]
             for band_idx in self._elevation_bands_index.values():
@@ -125,7 +339,41 @@ class ZonalStats:
                             unit.scale(self._array[date_idx][band_idx][product_idx]),
                         ),
                     )
-            writer.writerow(row)
+            yield row
+
+    def dump_to_csv(self: Self, out: IO) -> None:
+        writer = csv.writer(out, quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(self.csv_header())
+        writer.writerows(self.csv_rows())
+
+    @staticmethod
+    def computed_step(
+        elevation_band_step_feet: int,
+        base_step_feet: int | None,
+    ) -> int:
+        """The band step actually calculated from the rasters, which is
+        the base step when the requested step is a multiple of it. Steps
+        of 0 or less are all a single band over the AOI, so become 0."""
+        if elevation_band_step_feet <= 0:
+            return 0
+        if base_step_feet and elevation_band_step_feet % base_step_feet == 0:
+            return base_step_feet
+        return elevation_band_step_feet
+
+    @classmethod
+    def persisted_step(
+        cls: type[Self],
+        elevation_band_step_feet: int,
+        base_step_feet: int | None,
+    ) -> bool:
+        """Whether band indexes and results for a requested step may be
+        kept on disk, which is only so when it is computed as the base
+        step (the default step without one) or as the single band step,
+        so that clients can't add files for any step they like."""
+        return cls.computed_step(elevation_band_step_feet, base_step_feet) in {
+            0,
+            base_step_feet or DEFAULT_STEP_FEET,
+        }
 
     @classmethod
     def calculate(
@@ -133,81 +381,563 @@ class ZonalStats:
         aoi: AOIRasterWithArea,
         snodas_rasters: RasterCollection,
         elevation_band_step_feet: int = 1000,
+        parallel_threshold: int | None = PARALLEL_THRESHOLD,
+        max_workers: int | None = None,
+        persist_band_index: bool = False,
+        store: 'ZonalStatsStore | None' = None,
+        base_step_feet: int | None = None,
     ) -> Self:
-        aoi = aoi
-        elevation_bands = tuple(
-            ElevationBand.generate(
-                size_ft=elevation_band_step_feet,
-            ),
+        """Calculate zonal stats for each raster in the collection.
+
+        Collections of at least parallel_threshold rasters are spread
+        across max_workers worker processes (default is the cpu count),
+        started on first use and kept for the life of the process; set
+        parallel_threshold to None to always run serially.
+
+        Given a base_step_feet that divides elevation_band_step_feet,
+        stats are calculated for the finer base bands and merged into the
+        requested bands, so that any such step can share the same base
+        results (see computed_step).
+
+        Given a store, results are read from the store where available
+        and only the missing rasters are calculated and added to it.
+        The store must be the one for the computed step.
+        """
+        bands, per_date = cls._iter_calc_bands(
+            aoi,
+            snodas_rasters,
+            elevation_band_step_feet,
+            base_step_feet,
+            persist_band_index,
+            parallel_threshold,
+            max_workers,
+            store,
         )
 
         results: list[Result] = []
-        for raster in snodas_rasters:
-            # if we're going to introduce parallelism it would be here
-            # sharing the aoi and area arrays might be tricky, see
-            # https://stackoverflow.com/a/72437073
-            # probably want to make parallelism conditional on the
-            # size of raster set (like < 50 don't pay the parallel tax)
-            results.extend(cls._calc(aoi, raster, elevation_bands))
+        for date_results in per_date:
+            results.extend(date_results)
 
         return cls(
             snodas_rasters.products,
-            elevation_bands,
+            bands,
             tuple(snodas_rasters.dates),
             *results,
         )
 
-    @staticmethod
-    def _calc(
+    @classmethod
+    def iter_calculate(
+        cls: type[Self],
         aoi: AOIRasterWithArea,
-        snodas: SNODASRaster,
-        elevation_bands: Iterable[ElevationBand],
-    ) -> list[Result]:
-        date_ = snodas.fileinfo.datetime.date()
-        product = snodas.fileinfo.product
-        values_array = numpy.empty_like(
-            aoi.array,
-            dtype=numpy.int16,
+        snodas_rasters: RasterCollection,
+        elevation_band_step_feet: int = 1000,
+        parallel_threshold: int | None = PARALLEL_THRESHOLD,
+        max_workers: int | None = None,
+        persist_band_index: bool = False,
+        store: 'ZonalStatsStore | None' = None,
+        base_step_feet: int | None = None,
+    ) -> Iterator[Self]:
+        """Like calculate, but yields the zonal stats of each date
+        in date order as soon as that date has been calculated.
+
+        A collection without any dates yields one empty ZonalStats,
+        so consumers can always get the products and bands.
+        """
+        bands, per_date = cls._iter_calc_bands(
+            aoi,
+            snodas_rasters,
+            elevation_band_step_feet,
+            base_step_feet,
+            persist_band_index,
+            parallel_threshold,
+            max_workers,
+            store,
         )
-        values_array[:] = NODATA
 
-        for tile in aoi.intersected_tiles:
-            tile_origin = tile.origin()
-            offset_row = tile_origin.row - aoi.origin.row
-            offset_col = tile_origin.col - aoi.origin.col
-            values_array[
-                offset_row : offset_row + tile.size,
-                offset_col : offset_col + tile.size,
-            ] = snodas.load_tile(tile)
+        empty = True
+        for date_results in per_date:
+            empty = False
+            yield cls(
+                snodas_rasters.products,
+                bands,
+                (date_results[0].date,),
+                *date_results,
+            )
 
-        results: list[Result] = []
-        for band in elevation_bands:
-            selection: numpy.typing.NDArray[numpy.bool_] = (
-                (aoi.array >= band.min_meters)
-                & (aoi.array < band.max_meters)
-                & (values_array != NODATA)
+        if empty:
+            yield cls(snodas_rasters.products, bands, ())
+
+    @classmethod
+    def _iter_calc_bands(
+        cls: type[Self],
+        aoi: AOIRasterWithArea,
+        snodas_rasters: RasterCollection,
+        elevation_band_step_feet: int,
+        base_step_feet: int | None,
+        persist_band_index: bool,
+        parallel_threshold: int | None,
+        max_workers: int | None,
+        store: 'ZonalStatsStore | None',
+    ) -> tuple[tuple[ElevationBand, ...], Generator[list[Result], None, None]]:
+        """The requested bands, and the results of each date for them.
+
+        Finer computed bands are merged into the requested ones while
+        still arrays, so a Result is only made for each requested band.
+        """
+        step = cls.computed_step(elevation_band_step_feet, base_step_feet)
+        band_index = ElevationBandIndex.for_aoi(
+            aoi,
+            step,
+            persist=persist_band_index,
+        )
+        per_date = cls._iter_calc(
+            aoi,
+            snodas_rasters,
+            band_index,
+            parallel_threshold,
+            max_workers,
+            store,
+        )
+
+        if step == elevation_band_step_feet:
+            return band_index.bands, cls._iter_results(per_date, band_index.bands)
+
+        bands = tuple(ElevationBand.generate(size_ft=elevation_band_step_feet))
+        return bands, cls._iter_results(per_date, bands, band_index.bands)
+
+    @staticmethod
+    def _iter_results(
+        per_date: Generator[BandStats, None, None],
+        bands: tuple[ElevationBand, ...],
+        fine_bands: tuple[ElevationBand, ...] | None = None,
+    ) -> Generator[list[Result], None, None]:
+        """The results of each date for bands, merged
+        from the stats for fine_bands if given."""
+        try:
+            for stats in per_date:
+                if fine_bands is not None:
+                    stats = stats.merge_bands(fine_bands, bands)
+                yield stats.results(bands)
+        finally:
+            # so any results calculated so far are stored
+            per_date.close()
+
+    @classmethod
+    def calculate_batch(
+        cls: type[Self],
+        aois: Iterable[AOIRasterWithArea],
+        snodas_rasters: RasterCollection,
+        elevation_band_step_feet: int = 1000,
+        persist_band_index: bool = False,
+    ) -> dict[types.StationTriplet, Self]:
+        """Calculate zonal stats for many AOIs over the same rasters.
+
+        Rather than each AOI loading every tile it intersects, the AOIs
+        are grouped by tile and each tile of each raster is decoded once,
+        then scattered to the pixels of every AOI that touches it.
+        """
+        step = cls.computed_step(elevation_band_step_feet, None)
+        pixels: dict[types.StationTriplet, AOIPixels] = {}
+        band_indexes: dict[types.StationTriplet, ElevationBandIndex] = {}
+        for aoi in aois:
+            pixels[aoi.station_triplet] = aoi.pixels
+            band_indexes[aoi.station_triplet] = ElevationBandIndex.for_aoi(
+                aoi,
+                step,
+                persist=persist_band_index,
             )
 
-            if not selection.any():
-                results.append(
-                    Result(
-                        date=date_,
-                        product=product,
-                        elevation_band=band,
-                        mean=numpy.nan,
-                        area=0,
+        # for each tile, the aois that touch it and the
+        # range of their pixels that fall within it
+        tiles: dict[str, Tile] = {}
+        members: dict[str, list[tuple[types.StationTriplet, int, int]]] = {}
+        for triplet, aoi_pixels in pixels.items():
+            for idx, tile in enumerate(aoi_pixels.tiles):
+                tiles.setdefault(tile.quadkey, tile)
+                members.setdefault(tile.quadkey, []).append(
+                    (
+                        triplet,
+                        int(aoi_pixels.offsets[idx]),
+                        int(aoi_pixels.offsets[idx + 1]),
                     ),
                 )
-                continue
 
-            results.append(
-                Result(
-                    date=date_,
-                    product=product,
-                    elevation_band=band,
-                    mean=float(numpy.average(values_array[selection])),
-                    area=float(numpy.sum(aoi.area[selection])),
-                ),
+        results: dict[types.StationTriplet, list[Result]] = {
+            triplet: [] for triplet in pixels
+        }
+        scratch = ScratchBuffers()
+        for _, rasters in snodas_rasters.by_date():
+            stacks = {
+                triplet: scratch.stack(len(rasters), len(aoi_pixels), key=triplet)
+                for triplet, aoi_pixels in pixels.items()
+            }
+
+            for idx, raster in enumerate(rasters):
+                for quadkey, tile in tiles.items():
+                    values = raster.read_tile_into(tile, scratch.tile).ravel()
+                    for triplet, start, end in members[quadkey]:
+                        numpy.take(
+                            values,
+                            pixels[triplet].tile_index[start:end],
+                            out=stacks[triplet][idx, start:end],
+                            mode='clip',
+                        )
+
+            for triplet, stack in stacks.items():
+                results[triplet].extend(
+                    cls._reduce(
+                        pixels[triplet],
+                        rasters,
+                        stack,
+                        band_indexes[triplet],
+                        scratch,
+                        key=triplet,
+                    ).results(band_indexes[triplet].bands),
+                )
+
+        return {
+            triplet: cls(
+                snodas_rasters.products,
+                band_indexes[triplet].bands,
+                tuple(snodas_rasters.dates),
+                *triplet_results,
+            )
+            for triplet, triplet_results in results.items()
+        }
+
+    @classmethod
+    def _iter_calc(
+        cls: type[Self],
+        aoi: AOIRasterWithArea,
+        snodas_rasters: RasterCollection,
+        band_index: ElevationBandIndex,
+        parallel_threshold: int | None,
+        max_workers: int | None,
+        store: 'ZonalStatsStore | None',
+    ) -> Generator[BandStats, None, None]:
+        """Yield the stats of each date in date order."""
+        # for each date, the rasters we have stored results for
+        # and the rasters we still need to calculate
+        plan: list[tuple[list[SNODASRaster], list[SNODASRaster]]] = []
+        if store is not None:
+            store.load(aoi, band_index.bands)
+
+        for _, rasters in snodas_rasters.by_date():
+            stored = [r for r in rasters if store is not None and store.has(r)]
+            plan.append((stored, [r for r in rasters if r not in stored]))
+
+        by_date = [todo for _, todo in plan if todo]
+        count = sum(len(rasters) for rasters in by_date)
+        computed: Generator[BandStats, None, None] = (
+            cls._iter_calc_parallel(aoi.pixels, by_date, band_index, max_workers)
+            if parallel_threshold is not None and count >= parallel_threshold
+            else cls._iter_calc_serial(aoi.pixels, by_date, band_index)
+        )
+
+        try:
+            for stored, todo in plan:
+                stats, missing = cls._stored_stats(store, stored)
+                date_stats = [next(computed)] if todo else []
+                if missing:
+                    date_stats.append(cls._calc(aoi.pixels, missing, band_index))
+
+                # stored a date at a time, so memory stays flat
+                if store is not None and date_stats:
+                    store.add(BandStats.concat(date_stats), todo + missing)
+                yield BandStats.concat(stats + date_stats)
+        finally:
+            computed.close()
+
+            # whatever we calculated is saved, even if the
+            # consumer stopped before we got to every date
+            if store is not None:
+                store.flush()
+
+    @staticmethod
+    def _stored_stats(
+        store: 'ZonalStatsStore | None',
+        rasters: list[SNODASRaster],
+    ) -> tuple[list[BandStats], list[SNODASRaster]]:
+        """The stored stats of rasters, and any rasters
+        whose stats were rewritten since we planned."""
+        stats: list[BandStats] = []
+        missing: list[SNODASRaster] = []
+        for raster in rasters:
+            raster_stats = store.get(raster) if store is not None else None
+            if raster_stats is None:
+                missing.append(raster)
+            else:
+                stats.append(raster_stats)
+        return stats, missing
+
+    @staticmethod
+    def _iter_calc_serial(
+        pixels: AOIPixels,
+        by_date: list[list[SNODASRaster]],
+        band_index: ElevationBandIndex,
+    ) -> Generator[BandStats, None, None]:
+        scratch = ScratchBuffers()
+        for rasters in by_date:
+            yield ZonalStats._calc(pixels, rasters, band_index, scratch)
+
+    @staticmethod
+    def _iter_calc_parallel(
+        pixels: AOIPixels,
+        by_date: list[list[SNODASRaster]],
+        band_index: ElevationBandIndex,
+        max_workers: int | None = None,
+    ) -> Generator[BandStats, None, None]:
+        workers = max_workers or os.cpu_count() or 1
+        pools = _get_worker_pools(workers)
+
+        # the aoi pixel and band index arrays are shared with the workers via
+        # shared memory rather than pickled, so only the small metadata
+        # is copied into each process; see https://stackoverflow.com/a/72437073
+        with (
+            SharedArray.from_array(pixels.tile_index) as tile_index,
+            SharedArray.from_array(pixels.area) as area,
+            SharedArray.from_array(band_index.array) as index,
+        ):
+            aoi = WorkerAOI(
+                tiles=pixels.tiles,
+                offsets=pixels.offsets,
+                tile_index=tile_index.ref,
+                area=area.ref,
+                index=index.ref,
+                bands=band_index.bands,
+                band_areas=band_index.area,
+            )
+
+            # each date always goes to the same worker, so that
+            # repeated requests find its tiles in that worker's cache
+            shards: list[list[int]] = [[] for _ in pools]
+            for idx, rasters in enumerate(by_date):
+                date_ = rasters[0].fileinfo.datetime.date()
+                shards[date_.toordinal() % workers].append(idx)
+
+            chunksize = max(1, len(by_date) // (workers * 4))
+            futures: list[Future[list[BandStats]]] = []
+            # the future calculating each date, and its place in that future
+            located: dict[int, tuple[Future[list[BandStats]], int]] = {}
+            try:
+                for pool, shard in zip(pools, shards, strict=True):
+                    for start in range(0, len(shard), chunksize):
+                        chunk = shard[start : start + chunksize]
+                        future = pool.submit(
+                            _calc_worker,
+                            aoi,
+                            [by_date[idx] for idx in chunk],
+                        )
+                        futures.append(future)
+                        for pos, idx in enumerate(chunk):
+                            located[idx] = (future, pos)
+
+                for idx in range(len(by_date)):
+                    future, pos = located[idx]
+                    yield future.result()[pos]
+            except BrokenProcessPool:
+                # a worker died, so the next request starts new ones
+                _discard_worker_pools(workers, pools)
+                raise
+            finally:
+                # don't calculate dates nobody will consume, but let those
+                # running finish before their shared arrays are released
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+
+    @staticmethod
+    def _calc(
+        pixels: AOIPixels,
+        snodas_rasters: list[SNODASRaster],
+        band_index: ElevationBandIndex,
+        scratch: ScratchBuffers | None = None,
+    ) -> BandStats:
+        """Calculate the zonal stats of all products for one date.
+
+        The product rasters are loaded into one (products, pixels) stack
+        and every product and band is reduced with a single bincount per
+        statistic, sharing the band and nodata masks between products.
+        """
+        if scratch is None:
+            scratch = ScratchBuffers()
+
+        stack = scratch.stack(len(snodas_rasters), len(pixels))
+        pixels.load_rasters_values(
+            snodas_rasters,
+            stack,
+            scratch.tiles(len(snodas_rasters)),
+        )
+
+        return ZonalStats._reduce(pixels, snodas_rasters, stack, band_index, scratch)
+
+    @staticmethod
+    def _reduce(
+        pixels: AOIPixels,
+        snodas_rasters: list[SNODASRaster],
+        stack: numpy.typing.NDArray[numpy.int16],
+        band_index: ElevationBandIndex,
+        scratch: ScratchBuffers | None = None,
+        key: object = None,
+    ) -> BandStats:
+        """Reduce a (products, pixels) stack of the values of
+        one date's rasters to the stats for each band."""
+        date_ = snodas_rasters[0].fileinfo.datetime.date()
+        products = [raster.fileinfo.product for raster in snodas_rasters]
+        bands = len(band_index)
+
+        # the bins only depend on the band index, so are built once
+        # per calculation rather than for every date
+        if scratch is None:
+            scratch = ScratchBuffers()
+        in_band, bins = scratch.bins(band_index, len(products), key=key)
+        nodata = stack == NODATA
+        selection = in_band & ~nodata
+
+        counts = numpy.bincount(
+            bins[selection],
+            minlength=len(products) * bands,
+        ).reshape(len(products), bands)
+        sums = numpy.bincount(
+            bins[selection],
+            weights=stack[selection],
+            minlength=len(products) * bands,
+        ).reshape(len(products), bands)
+
+        # nodata pixels are rare within an AOI, so we take the area
+        # of each band from the index, less that of any nodata pixels
+        areas = numpy.broadcast_to(band_index.area, (len(products), bands))
+        nodata &= in_band
+        if nodata.any():
+            areas = areas - numpy.bincount(
+                bins[nodata],
+                weights=numpy.broadcast_to(pixels.area, stack.shape)[nodata],
+                minlength=len(products) * bands,
+            ).reshape(len(products), bands)
+
+        has_pixels = counts > 0
+        return BandStats(
+            date=date_,
+            products=products,
+            mean=numpy.divide(
+                sums,
+                counts,
+                out=numpy.full_like(sums, numpy.nan),
+                where=has_pixels,
+            ),
+            count=counts.astype(numpy.int64),
+            area=numpy.where(has_pixels, areas, 0),
+        )
+
+
+def _band_groups(
+    fine_bands: tuple[ElevationBand, ...],
+    bands: tuple[ElevationBand, ...],
+) -> numpy.typing.NDArray[numpy.intp]:
+    """The index of the band in bands, which must be in order,
+    that each fine band is within."""
+    mins = [band.min for band in bands]
+    groups = numpy.empty(len(fine_bands), dtype=numpy.intp)
+    for idx, fine in enumerate(fine_bands):
+        group = bisect.bisect_right(mins, fine.min) - 1
+        if group < 0 or fine.max > bands[group].max:
+            raise ValueError(
+                f'Elevation band {fine} is not within a single band to merge into',
             )
+        groups[idx] = group
+    return groups
+
+
+def _get_worker_pools(workers: int) -> list[ProcessPoolExecutor]:
+    """A single-process pool for each of workers, started on first use.
+
+    Workers live as long as this process, so each keeps a tile cache
+    across requests, with an equal share of this process's budget.
+    """
+    with _worker_pools_lock:
+        pools = _worker_pools.get(workers)
+        if pools is None:
+            maxbytes = get_tile_cache().maxbytes
+            tile_cache_bytes = None if maxbytes is None else maxbytes // workers
+            pools = [
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=MP_CONTEXT,
+                    initializer=_init_worker,
+                    initargs=(tile_cache_bytes,),
+                )
+                for _ in range(workers)
+            ]
+            _worker_pools[workers] = pools
+        return pools
+
+
+def _discard_worker_pools(workers: int, pools: list[ProcessPoolExecutor]) -> None:
+    with _worker_pools_lock:
+        if _worker_pools.get(workers) is pools:
+            del _worker_pools[workers]
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _init_worker(tile_cache_bytes: int | None) -> None:
+    # workers don't set up the django app, which applies the
+    # configured budget, so they are given their share of it
+    get_tile_cache().maxbytes = tile_cache_bytes
+
+
+def _attach_worker_aoi(aoi: WorkerAOI) -> tuple[AOIPixels, ElevationBandIndex]:
+    """The pixels and band index of aoi, attached to its shared
+    arrays the first time this worker calculates for it."""
+    global _worker_aoi, _worker_pixels, _worker_band_index, _worker_scratch
+
+    if (
+        _worker_aoi == aoi.tile_index.name
+        and _worker_pixels is not None
+        and _worker_band_index is not None
+    ):
+        return _worker_pixels, _worker_band_index
+
+    # nothing may still view the arrays of the last aoi when they are closed,
+    # and we hold those of this one so they stay attached until the next
+    _worker_pixels = None
+    _worker_band_index = None
+    _worker_scratch = None
+    while _worker_shared:
+        _worker_shared.pop().close()
+
+    tile_index = SharedArray.attach(aoi.tile_index)
+    area = SharedArray.attach(aoi.area)
+    index = SharedArray.attach(aoi.index)
+    _worker_shared.extend((tile_index, area, index))
+    _worker_aoi = aoi.tile_index.name
+    _worker_pixels = AOIPixels(
+        tiles=aoi.tiles,
+        offsets=aoi.offsets,
+        tile_index=tile_index.array,
+        # elevations are only needed to build the band index
+        elevation=numpy.empty(0, dtype=numpy.float32),
+        area=area.array,
+    )
+    _worker_band_index = ElevationBandIndex(
+        bands=aoi.bands,
+        array=index.array,
+        area=aoi.band_areas,
+    )
+    return _worker_pixels, _worker_band_index
+
+
+def _calc_worker(
+    aoi: WorkerAOI,
+    by_date: list[list[SNODASRaster]],
+) -> list[BandStats]:
+    global _worker_scratch
+
+    pixels, band_index = _attach_worker_aoi(aoi)
+    if _worker_scratch is None:
+        _worker_scratch = ScratchBuffers()
 
-        return results
+    return [
+        ZonalStats._calc(pixels, rasters, band_index, _worker_scratch)
+        for rasters in by_date
+    ]
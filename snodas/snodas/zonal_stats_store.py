@@ -0,0 +1,300 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from datetime import date
+from pathlib import Path
+from typing import Self
+
+import numpy
+import numpy.typing
+
+from snodas.snodas.elevation_band import ElevationBand
+from snodas.snodas.fileinfo import Product
+from snodas.snodas.raster import AOIRaster, SNODASRaster
+from snodas.snodas.zonal_stats import BandStats
+from snodas.utils.filesystem import atomic_write, file_lock
+
+Key = tuple[date, Product]
+
+
+@dataclass
+class StoredRows:
+    """Rows of results in the columnar layout of a store file,
+    with a column per band in the 2-D value arrays."""
+
+    date: numpy.typing.NDArray[numpy.datetime64]
+    product: numpy.typing.NDArray[numpy.str_]
+    source_mtime: numpy.typing.NDArray[numpy.int64]
+    mean: numpy.typing.NDArray[numpy.float64]
+    count: numpy.typing.NDArray[numpy.int64]
+    area: numpy.typing.NDArray[numpy.float64]
+
+    def __len__(self: Self) -> int:
+        return len(self.date)
+
+    def keys(self: Self) -> list[Key]:
+        return [
+            (date_, Product(product))
+            for date_, product in zip(
+                self.date.tolist(),
+                self.product.tolist(),
+                strict=True,
+            )
+        ]
+
+    def take(self: Self, idx: numpy.typing.ArrayLike) -> Self:
+        return replace(
+            self,
+            date=self.date[idx],
+            product=self.product[idx],
+            source_mtime=self.source_mtime[idx],
+            mean=self.mean[idx],
+            count=self.count[idx],
+            area=self.area[idx],
+        )
+
+    @classmethod
+    def empty(cls: type[Self], bands: int) -> Self:
+        return cls(
+            date=numpy.empty(0, dtype='datetime64[D]'),
+            product=numpy.empty(0, dtype=str),
+            source_mtime=numpy.empty(0, dtype=numpy.int64),
+            mean=numpy.empty((0, bands)),
+            count=numpy.empty((0, bands), dtype=numpy.int64),
+            area=numpy.empty((0, bands)),
+        )
+
+    @classmethod
+    def merge(cls: type[Self], rows: list[Self]) -> Self:
+        """Concatenate rows, keeping only the last of any with
+        the same (date, product), in (date, product) order."""
+        merged = cls(
+            date=numpy.concatenate([r.date for r in rows]),
+            product=numpy.concatenate([r.product for r in rows]),
+            source_mtime=numpy.concatenate([r.source_mtime for r in rows]),
+            mean=numpy.concatenate([r.mean for r in rows]),
+            count=numpy.concatenate([r.count for r in rows]),
+            area=numpy.concatenate([r.area for r in rows]),
+        )
+        last = {key: idx for idx, key in enumerate(merged.keys())}
+        return merged.take(
+            numpy.array([last[key] for key in sorted(last)], dtype=numpy.intp),
+        )
+
+
+class ZonalStatsStore:
+    """
+    Durable store of the zonal stats results of one AOI for one
+    elevation band step, kept as a directory of columnar npz files,
+    one per year, each with a row per (date, product) and a column
+    per band. Only the range of bands the AOI has pixels in is
+    written, compressed, as the rest are always empty.
+
+    Only the files of the years a query touches are read, and only
+    the values of one year are held at a time. New rows are written
+    out a year at a time as they are added, merged under a lock into
+    whatever is then on disk, so concurrent calculations for the same
+    AOI keep each other's rows.
+
+    Rows record the modification time of the SNODAS raster they were
+    calculated from and are ignored if the raster has since changed.
+    A year's file is discarded if the AOI raster or the elevation
+    bands no longer match.
+    """
+
+    def __init__(self: Self, path: Path) -> None:
+        self.path = path
+        self._aoi_mtime: int = 0
+        self._bands: tuple[ElevationBand, ...] = ()
+        # the stored source mtime of each row, per year
+        self._index: dict[int, dict[Key, int]] = {}
+        # the values of at most one year
+        self._year: int | None = None
+        self._rows: dict[Key, int] = {}
+        self._values = StoredRows.empty(0)
+        # rows not yet written, per year
+        self._pending: dict[int, list[StoredRows]] = {}
+
+    def load(
+        self: Self,
+        aoi: AOIRaster,
+        bands: tuple[ElevationBand, ...],
+    ) -> None:
+        """Reset the store for an AOI and its bands. Files
+        are only read as their years are asked for."""
+        self._aoi_mtime = aoi.path.stat().st_mtime_ns
+        self._bands = bands
+        self._index = {}
+        self._year = None
+        self._rows = {}
+        self._values = StoredRows.empty(len(bands))
+        self._pending = {}
+
+    def year_path(self: Self, year: int) -> Path:
+        return self.path / f'{year}.npz'
+
+    def has(self: Self, raster: SNODASRaster) -> bool:
+        date_ = raster.fileinfo.datetime.date()
+        stored = self._year_index(date_.year).get((date_, raster.fileinfo.product))
+        return stored is not None and stored == raster.path.stat().st_mtime_ns
+
+    def get(self: Self, raster: SNODASRaster) -> BandStats | None:
+        date_ = raster.fileinfo.datetime.date()
+        product = raster.fileinfo.product
+
+        if self._year != date_.year:
+            self._year = date_.year
+            self._values = self._read(date_.year) or StoredRows.empty(len(self._bands))
+            self._rows = {key: idx for idx, key in enumerate(self._values.keys())}
+
+        # the file may have been rewritten since we checked the index
+        idx = self._rows.get((date_, product))
+        if (
+            idx is None
+            or self._values.source_mtime[idx] != raster.path.stat().st_mtime_ns
+        ):
+            return None
+
+        return BandStats(
+            date=date_,
+            products=[product],
+            mean=self._values.mean[idx : idx + 1],
+            count=self._values.count[idx : idx + 1],
+            area=self._values.area[idx : idx + 1],
+        )
+
+    def add(
+        self: Self,
+        stats: BandStats,
+        rasters: Iterable[SNODASRaster],
+    ) -> None:
+        """Add the stats of one date calculated from rasters, expected
+        in date order. Years before that of the date are written out."""
+        source_mtimes = {
+            raster.fileinfo.product: raster.path.stat().st_mtime_ns
+            for raster in rasters
+        }
+        added = StoredRows(
+            date=numpy.full(len(stats.products), stats.date, dtype='datetime64[D]'),
+            product=numpy.array([product.value for product in stats.products]),
+            source_mtime=numpy.array(
+                [source_mtimes[product] for product in stats.products],
+                dtype=numpy.int64,
+            ),
+            mean=stats.mean,
+            count=stats.count,
+            area=stats.area,
+        )
+
+        year = stats.date.year
+        for year_ in sorted(self._pending.keys() - {year}):
+            self.flush(year_)
+
+        self._pending.setdefault(year, []).append(added)
+
+    def flush(self: Self, year: int | None = None) -> None:
+        """Write the rows added for a year, or every year if None."""
+        for year_ in [year] if year is not None else sorted(self._pending):
+            pending = self._pending.pop(year_, [])
+            if not pending:
+                continue
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            path = self.year_path(year_)
+
+            with file_lock(path.with_suffix('.lock')):
+                merged = StoredRows.merge(
+                    [self._read(year_) or StoredRows.empty(len(self._bands)), *pending],
+                )
+                start, end = self._occupied(merged.count)
+                with atomic_write(path) as f:
+                    numpy.savez_compressed(
+                        f,
+                        aoi_mtime=numpy.int64(self._aoi_mtime),
+                        bands=self._bands_array(self._bands),
+                        band_offset=numpy.int64(start),
+                        date=merged.date,
+                        product=merged.product,
+                        source_mtime=merged.source_mtime,
+                        mean=merged.mean[:, start:end],
+                        count=merged.count[:, start:end],
+                        area=merged.area[:, start:end],
+                    )
+
+            self._index[year_] = dict(
+                zip(merged.keys(), merged.source_mtime.tolist(), strict=True),
+            )
+            if self._year == year_:
+                self._year = None
+
+    def _year_index(self: Self, year: int) -> dict[Key, int]:
+        index = self._index.get(year)
+        if index is None:
+            # npz members are read lazily, so this skips the values
+            index = {}
+            try:
+                with numpy.load(self.year_path(year)) as npz:
+                    if self._matches(npz):
+                        keys = zip(
+                            npz['date'].tolist(),
+                            map(Product, npz['product'].tolist()),
+                            strict=True,
+                        )
+                        index = dict(
+                            zip(keys, npz['source_mtime'].tolist(), strict=True),
+                        )
+            except (OSError, KeyError, ValueError):
+                # missing or unreadable file, as good as empty
+                pass
+            self._index[year] = index
+        return index
+
+    def _read(self: Self, year: int) -> StoredRows | None:
+        try:
+            with numpy.load(self.year_path(year)) as npz:
+                if not self._matches(npz):
+                    return None
+
+                offset = int(npz['band_offset'])
+                return StoredRows(
+                    date=npz['date'],
+                    product=npz['product'],
+                    source_mtime=npz['source_mtime'],
+                    mean=self._widen(npz['mean'], offset, numpy.nan),
+                    count=self._widen(npz['count'], offset, 0),
+                    area=self._widen(npz['area'], offset, 0),
+                )
+        except (OSError, KeyError, ValueError):
+            # missing or unreadable file, as good as empty
+            return None
+
+    def _matches(self: Self, npz: numpy.lib.npyio.NpzFile) -> bool:
+        return int(npz['aoi_mtime']) == self._aoi_mtime and numpy.array_equal(
+            npz['bands'],
+            self._bands_array(self._bands),
+        )
+
+    @staticmethod
+    def _occupied(count: numpy.typing.NDArray[numpy.int64]) -> tuple[int, int]:
+        """The range of bands with pixels in any row."""
+        occupied = numpy.flatnonzero((count > 0).any(axis=0))
+        if not len(occupied):
+            return 0, 0
+        return int(occupied[0]), int(occupied[-1]) + 1
+
+    def _widen[T: numpy.generic](
+        self: Self,
+        values: numpy.typing.NDArray[T],
+        offset: int,
+        fill: float,
+    ) -> numpy.typing.NDArray[T]:
+        """Values stored for the bands from offset, as values for all
+        bands, with the bands outside of them as empty."""
+        widened = numpy.full((len(values), len(self._bands)), fill, values.dtype)
+        widened[:, offset : offset + values.shape[1]] = values
+        return widened
+
+    @staticmethod
+    def _bands_array(
+        bands: tuple[ElevationBand, ...],
+    ) -> numpy.typing.NDArray[numpy.float64]:
+        return numpy.array([(band.min, band.max) for band in bands], dtype=float)
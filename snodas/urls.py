@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from enum import StrEnum
-from io import StringIO
 from typing import Self
 
 from django.conf import settings
@@ -13,7 +12,7 @@ from ninja.responses import Response
 
 from snodas import types
 from snodas.snodas.fileinfo import Product
-from snodas.utils.http import stream_file
+from snodas.utils.http import stream_chunks
 from snodas.views import (
     pourpoints,
     stats,
@@ -24,15 +23,20 @@ from snodas.views import (
 class ResponseFormat(StrEnum):
     JSON = 'json'
     CSV = 'csv'
+    NDJSON = 'ndjson'
 
     @classmethod
     def from_request(cls: type[Self], request: HttpRequest) -> ResponseFormat:
         # default to application/json, even if not explicitly accepted
-        # only fall down to csv if it is accepted and json is not
+        # only fall down to ndjson or csv if accepted and json is not
         # have to check it first for Accepts values like */*
-        if request.accepts('application/json') or not request.accepts('text/csv'):
+        if request.accepts('application/json'):
             return cls.JSON
-        return cls.CSV
+        if request.accepts('application/x-ndjson'):
+            return cls.NDJSON
+        if request.accepts('text/csv'):
+            return cls.CSV
+        return cls.JSON
 
 
 api = NinjaAPI()
@@ -299,14 +303,13 @@ def zonal_stats(
             message='Pourpoint does not have an AOI polygon',
         )
 
-    results = stats.get_pourpoint_zonal_stats(
-        pourpoint.properties.station_triplet,
-        query,
-        products,
-        elevation_band_step_feet=elevation_band_step_ft,
-    )
-
     if response_format == ResponseFormat.JSON:
+        results = stats.get_pourpoint_zonal_stats(
+            pourpoint.properties.station_triplet,
+            query,
+            products,
+            elevation_band_step_feet=elevation_band_step_ft,
+        )
         return Response(
             types.PourPointZonalStats(
                 pourpoint=pourpoint,
@@ -324,12 +327,28 @@ def zonal_stats(
             ),
         )
 
-    flike = StringIO()
-    results.dump_to_csv(flike)
-    return stream_file(
-        flike,
-        query.csv_name(pourpoint.properties.name, zone_size=elevation_band_step_ft),
-        request,
+    # ndjson and csv are streamed a date at a time as they are calculated
+    per_date = stats.iter_pourpoint_zonal_stats(
+        pourpoint.properties.station_triplet,
+        query,
+        products,
+        elevation_band_step_feet=elevation_band_step_ft,
+    )
+    filename = query.csv_name(
+        pourpoint.properties.name,
+        zone_size=elevation_band_step_ft,
+    )
+
+    if response_format == ResponseFormat.NDJSON:
+        return stream_chunks(
+            stats.zonal_stats_ndjson(per_date),
+            f'{filename.removesuffix(".csv")}.ndjson',
+            'application/x-ndjson',
+        )
+
+    return stream_chunks(
+        stats.zonal_stats_csv(per_date),
+        filename,
         'text/csv',
     )
 
@@ -0,0 +1,98 @@
+import threading
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Self
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    entries: int
+    bytes: int
+
+    @property
+    def hit_rate(self: Self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache[K: Hashable, V]:
+    """Thread-safe mapping holding at most maxsize entries,
+    evicting the least recently used entry when full.
+
+    Given a sizeof function, the entries are also kept within maxbytes
+    in total. Entries larger than maxbytes on their own are not kept.
+    Either limit can be None for no limit.
+    """
+
+    def __init__(
+        self: Self,
+        maxsize: int | None = 128,
+        maxbytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._sizeof = sizeof
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self: Self) -> int:
+        return len(self._entries)
+
+    def __contains__(self: Self, key: K) -> bool:
+        return key in self._entries
+
+    def get(self: Self, key: K) -> V | None:
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return self._entries[key][0]
+
+    def put(self: Self, key: K, value: V) -> None:
+        size = self._sizeof(value) if self._sizeof is not None else 0
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self: Self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    def _evict(self: Self) -> None:
+        while (self.maxsize is not None and len(self._entries) > self.maxsize) or (
+            self.maxbytes is not None and self._bytes > self.maxbytes
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
@@ -1,4 +1,14 @@
+import os
+import sys
+import tempfile
+
 from contextlib import contextmanager
+from pathlib import Path
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
 
 
 @contextmanager
@@ -21,6 +31,53 @@ def tempdirectory(suffix='', prefix='', dir=None, do_not_remove=False):
             rmtree(tmpdir)
 
 
+@contextmanager
+def atomic_write(path: Path, mode='wb'):
+    """A context manager for writing a file via a temporary
+    file in the same directory, which replaces path only once
+    writing succeeds, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(
+        dir=path.parent,
+        prefix=f'.{path.name}.',
+        suffix='.tmp',
+    )
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        Path(tmp).replace(path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def file_lock(path: Path):
+    """A context manager holding an exclusive lock on path, which
+    is created if it does not exist, waiting until the lock is free.
+    The lock is advisory, so it only excludes other file_lock users."""
+    with path.open('a+b') as f:
+        if sys.platform == 'win32':
+            # msvcrt only waits ~10 seconds before raising
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
 class FileWrapper:
     """Wrapper to convert file-like objects to iterables,
     based on the FileWrapper class from wsgiref, but modified to
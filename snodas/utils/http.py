@@ -50,3 +50,14 @@ def stream_file(filelike, filename, request, content_type):
         response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
 
     return response
+
+
+def stream_chunks(chunks, filename, content_type):
+    """Stream an iterable of chunks of unknown total
+    length as an attachment, without buffering them."""
+    response = StreamingHttpResponse(
+        chunks,
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = 'attachment; filename="' + filename + '"'
+    return response
@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Self
+
+import numpy
+import numpy.typing
+
+
+@dataclass(frozen=True)
+class SharedArrayRef:
+    """Picklable reference to a SharedArray, used to attach to
+    the array from another process without copying its data."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedArray:
+    """A numpy array backed by a named shared memory block.
+
+    The creating process owns the block and unlinks it on close;
+    other processes attach via a SharedArrayRef and only close
+    their mapping.
+    """
+
+    def __init__(
+        self: Self,
+        shm: shared_memory.SharedMemory,
+        shape: tuple[int, ...],
+        dtype: numpy.typing.DTypeLike,
+        owner: bool = False,
+    ) -> None:
+        self._shm = shm
+        self._owner = owner
+        self.array: numpy.typing.NDArray[Any] = numpy.ndarray(
+            shape,
+            dtype=dtype,
+            buffer=shm.buf,
+        )
+
+    @classmethod
+    def from_array(cls: type[Self], array: numpy.typing.NDArray[Any]) -> Self:
+        # zero-size shared memory blocks are not allowed
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self = cls(shm, array.shape, array.dtype, owner=True)
+        self.array[...] = array
+        return self
+
+    @classmethod
+    def attach(cls: type[Self], ref: SharedArrayRef) -> Self:
+        return cls(
+            shared_memory.SharedMemory(name=ref.name),
+            ref.shape,
+            ref.dtype,
+        )
+
+    @property
+    def ref(self: Self) -> SharedArrayRef:
+        return SharedArrayRef(
+            name=self._shm.name,
+            shape=self.array.shape,
+            dtype=self.array.dtype.str,
+        )
+
+    def close(self: Self) -> None:
+        # the array must be released before the buffer can be closed
+        del self.array
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self: Self) -> Self:
+        return self
+
+    def __exit__(self: Self, *_) -> None:
+        self.close()
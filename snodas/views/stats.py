@@ -1,6 +1,9 @@
-from collections.abc import Iterable
-from io import BytesIO
-from typing import assert_never
+import csv
+import logging
+
+from collections.abc import Iterable, Iterator
+from io import BytesIO, StringIO
+from typing import Any, assert_never
 
 from django.conf import settings
 from django.db import connection
@@ -11,13 +14,17 @@ from snodas.queries import streamflow  # type: ignore
 from snodas.snodas.db import get_raster_database
 from snodas.snodas.fileinfo import Product
 from snodas.snodas.raster import (
-    AOIRaster,
     AOIRasterWithArea,
+    get_aoi_cache,
+    get_tile_cache,
 )
 from snodas.snodas.raster_collection import RasterCollection
 from snodas.snodas.zonal_stats import ZonalStats
+from snodas.snodas.zonal_stats_store import ZonalStatsStore
 from snodas.utils.http import stream_file
 
+logger = logging.getLogger(__name__)
+
 
 def raw_stat_query_csv(
     request,
@@ -54,28 +61,105 @@ def get_pourpoint_stats(
         ]
 
 
-def get_pourpoint_zonal_stats(
+def _zonal_stats_args(
     station_triplet: types.StationTriplet,
     query: types.DateQuery,
     products: Iterable[Product],
     elevation_band_step_feet: int = 1000,
-) -> ZonalStats:
+) -> dict[str, Any]:
     rasterdb = get_raster_database(settings.SNODAS_RASTERDB)
-    aoi = AOIRasterWithArea.from_aoi_raster(
-        AOIRaster.open(rasterdb.aoi_raster_path_from_triplet(station_triplet)),
-        rasterdb.area_raster(),
+    aoi = AOIRasterWithArea.open_cached(
+        rasterdb.aoi_raster_path_from_triplet(station_triplet),
     )
     snodas_rasters = RasterCollection.from_products_query(
         products=set(products),
         query=query,
     )
-    return ZonalStats.calculate(
-        aoi,
-        snodas_rasters,
-        elevation_band_step_feet,
+    # steps that are multiples of the base step are merged from stored
+    # base step results, so the store is that of the computed step;
+    # other steps are calculated every time rather than adding files
+    base_step_feet = settings.SNODAS_ZONAL_STATS_BASE_STEP
+    persist = ZonalStats.persisted_step(elevation_band_step_feet, base_step_feet)
+    store = (
+        ZonalStatsStore(
+            rasterdb.zonal_stats_store_path(
+                station_triplet,
+                ZonalStats.computed_step(elevation_band_step_feet, base_step_feet),
+            ),
+        )
+        if settings.SNODAS_ZONAL_STATS_STORE and persist
+        else None
+    )
+    return {
+        'aoi': aoi,
+        'snodas_rasters': snodas_rasters,
+        'elevation_band_step_feet': elevation_band_step_feet,
+        'parallel_threshold': settings.SNODAS_ZONAL_STATS_PARALLEL_THRESHOLD,
+        'max_workers': settings.SNODAS_ZONAL_STATS_MAX_WORKERS,
+        'persist_band_index': settings.SNODAS_PERSIST_BAND_INDEX and persist,
+        'store': store,
+        'base_step_feet': base_step_feet,
+    }
+
+
+def get_pourpoint_zonal_stats(
+    station_triplet: types.StationTriplet,
+    query: types.DateQuery,
+    products: Iterable[Product],
+    elevation_band_step_feet: int = 1000,
+) -> ZonalStats:
+    stats = ZonalStats.calculate(
+        **_zonal_stats_args(
+            station_triplet,
+            query,
+            products,
+            elevation_band_step_feet,
+        ),
+    )
+    # parallel calculations use the tile caches of the pool workers,
+    # so these are the stats of serial calculations alone
+    logger.debug('SNODAS tile cache: %s', get_tile_cache().stats())
+    logger.debug('AOI cache: %s', get_aoi_cache().stats())
+    return stats
+
+
+def iter_pourpoint_zonal_stats(
+    station_triplet: types.StationTriplet,
+    query: types.DateQuery,
+    products: Iterable[Product],
+    elevation_band_step_feet: int = 1000,
+) -> Iterator[ZonalStats]:
+    return ZonalStats.iter_calculate(
+        **_zonal_stats_args(
+            station_triplet,
+            query,
+            products,
+            elevation_band_step_feet,
+        ),
     )
 
 
+def zonal_stats_ndjson(results: Iterable[ZonalStats]) -> Iterator[str]:
+    for stats in results:
+        for stat in stats.dump():
+            yield stat.model_dump_json(exclude_unset=True, exclude_none=True) + '\n'
+
+
+def zonal_stats_csv(results: Iterable[ZonalStats]) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL)
+    header = True
+
+    for stats in results:
+        if header:
+            writer.writerow(stats.csv_header())
+            header = False
+        writer.writerows(stats.csv_rows())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
 def get_csv_statistics(
     request,
     pourpoint_ref: int | str,
@@ -0,0 +1,60 @@
+import numpy
+
+from snodas.utils.cache import LRUCache
+
+
+def array_cache(maxbytes):
+    return LRUCache(maxsize=None, maxbytes=maxbytes, sizeof=lambda a: a.nbytes)
+
+
+def test_evicts_least_recently_used_over_byte_budget():
+    cache = array_cache(maxbytes=300)
+    for key in 'abc':
+        cache.put(key, numpy.zeros(100, dtype=numpy.uint8))
+
+    # a is now the most recently used, so b is evicted first
+    assert cache.get('a') is not None
+    cache.put('d', numpy.zeros(100, dtype=numpy.uint8))
+
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.stats().bytes == 300
+
+
+def test_evicts_as_many_as_needed():
+    cache = array_cache(maxbytes=300)
+    for key in 'abc':
+        cache.put(key, numpy.zeros(100, dtype=numpy.uint8))
+
+    cache.put('d', numpy.zeros(250, dtype=numpy.uint8))
+
+    assert [key for key in 'abcd' if key in cache] == ['d']
+    assert cache.stats().bytes == 250
+
+
+def test_replacing_an_entry_frees_its_bytes():
+    cache = array_cache(maxbytes=300)
+    cache.put('a', numpy.zeros(200, dtype=numpy.uint8))
+    cache.put('a', numpy.zeros(50, dtype=numpy.uint8))
+    cache.put('b', numpy.zeros(200, dtype=numpy.uint8))
+
+    assert 'a' in cache
+    assert cache.stats().bytes == 250
+
+
+def test_entries_over_byte_budget_are_not_kept():
+    cache = array_cache(maxbytes=100)
+    cache.put('a', numpy.zeros(50, dtype=numpy.uint8))
+    cache.put('b', numpy.zeros(101, dtype=numpy.uint8))
+
+    assert 'a' in cache
+    assert 'b' not in cache
+
+
+def test_zero_byte_budget_keeps_nothing():
+    cache = array_cache(maxbytes=0)
+    cache.put('a', numpy.zeros(1, dtype=numpy.uint8))
+
+    assert len(cache) == 0
+    assert cache.get('a') is None
+    assert cache.stats().misses == 1
@@ -0,0 +1,126 @@
+import os
+import shutil
+
+from datetime import date
+
+import pytest
+
+from snodas.snodas.catalog import DATE_FORMAT, RasterCatalog
+from snodas.snodas.fileinfo import Product
+from snodas.snodas.manifest import RasterManifest
+
+DATE = date(2024, 1, 1)
+NEXT_DATE = date(2024, 1, 2)
+
+NAMES = {
+    Product.PRECIP_SOLID: 'us_ssmv01025SlL01T0024TTNATS{}05DP001.tif',
+    Product.PRECIP_LIQUID: 'us_ssmv01025SlL00T0024TTNATS{}05DP001.tif',
+    Product.SNOW_WATER_EQUIVALENT: 'us_ssmv11034tS__T0001TTNATS{}05HP001.tif',
+    Product.SNOW_DEPTH: 'us_ssmv11036tS__T0001TTNATS{}05HP001.tif',
+    Product.AVERAGE_TEMP: 'us_ssmv11038wS__A0024TTNATS{}05DP001.tif',
+    Product.SUBLIMATION: 'us_ssmv11050lL00T0024TTNATS{}05DP001.tif',
+    Product.SUBLIMATION_BLOWING: 'us_ssmv11039lL00T0024TTNATS{}05DP001.tif',
+    Product.RUNOFF: 'us_ssmv11044bS__T0024TTNATS{}05DP001.tif',
+}
+
+
+@pytest.fixture
+def cogs(tmp_path):
+    path = tmp_path / 'cogs'
+    path.mkdir()
+    return path
+
+
+def write_cogs(cogs, date_, products=tuple(Product)):
+    directory = cogs / date_.strftime(DATE_FORMAT)
+    directory.mkdir(exist_ok=True)
+    paths = {}
+    for product in products:
+        paths[product] = directory / NAMES[product].format(
+            date_.strftime(DATE_FORMAT),
+        )
+        paths[product].touch()
+    return paths
+
+
+def set_mtime(path, seconds):
+    # explicit mtimes, as writes within one tick may not change them
+    ns = seconds * 10**9
+    os.utime(path, ns=(ns, ns))
+
+
+def test_refresh_rescans_incomplete_dates(cogs):
+    write_cogs(cogs, DATE, [Product.SNOW_WATER_EQUIVALENT])
+    set_mtime(cogs / DATE.strftime(DATE_FORMAT), 1)
+    set_mtime(cogs, 1)
+
+    catalog = RasterCatalog(cogs)
+    catalog.refresh()
+    assert catalog.paths(DATE, Product.SNOW_DEPTH) == []
+
+    # the rest of the date arrives without cogs/ itself changing
+    paths = write_cogs(cogs, DATE, [Product.SNOW_DEPTH])
+    set_mtime(cogs / DATE.strftime(DATE_FORMAT), 2)
+    set_mtime(cogs, 1)
+
+    catalog.refresh()
+    assert catalog.paths(DATE, Product.SNOW_DEPTH) == [paths[Product.SNOW_DEPTH]]
+
+
+def test_refresh_skips_complete_dates(cogs, monkeypatch):
+    paths = write_cogs(cogs, DATE)
+
+    catalog = RasterCatalog(cogs)
+    catalog.refresh()
+    assert catalog.paths(DATE, Product.RUNOFF) == [paths[Product.RUNOFF]]
+
+    def scan(*_):
+        raise AssertionError('scanned')
+
+    monkeypatch.setattr(RasterCatalog, '_scan_date', scan)
+    catalog.refresh()
+
+
+def test_refresh_follows_cogs_mtime(cogs):
+    write_cogs(cogs, DATE)
+    set_mtime(cogs, 1)
+
+    catalog = RasterCatalog(cogs)
+    catalog.refresh()
+
+    paths = write_cogs(cogs, NEXT_DATE)
+    shutil.rmtree(cogs / DATE.strftime(DATE_FORMAT))
+    set_mtime(cogs, 2)
+
+    catalog.refresh()
+    assert catalog.paths(DATE, Product.RUNOFF) == []
+    assert catalog.paths(NEXT_DATE, Product.RUNOFF) == [paths[Product.RUNOFF]]
+
+
+def test_refresh_loads_complete_manifest(cogs, tmp_path, monkeypatch):
+    paths = write_cogs(cogs, DATE)
+    write_cogs(cogs, NEXT_DATE, [Product.SNOW_WATER_EQUIVALENT])
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+    manifest.rebuild()
+
+    def scan(*_, **__):
+        raise AssertionError('scanned')
+
+    monkeypatch.setattr(RasterCatalog, '_scan_all', scan)
+    monkeypatch.setattr(RasterCatalog, '_scan_date', scan)
+
+    catalog = RasterCatalog(cogs, manifest)
+    catalog.refresh()
+    assert catalog.paths(DATE, Product.RUNOFF) == [paths[Product.RUNOFF]]
+    assert catalog.paths(NEXT_DATE, Product.RUNOFF) == []
+
+
+def test_refresh_scans_without_complete_manifest(cogs, tmp_path):
+    paths = write_cogs(cogs, DATE)
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+    # recording a date alone leaves the manifest incomplete
+    manifest.record_date(NEXT_DATE)
+
+    catalog = RasterCatalog(cogs, manifest)
+    catalog.refresh()
+    assert catalog.paths(DATE, Product.RUNOFF) == [paths[Product.RUNOFF]]
@@ -0,0 +1,44 @@
+from datetime import date
+from types import SimpleNamespace
+
+from snodas.exceptions import IncompleteDateError
+from snodas.management.commands import consolidaterasters
+
+DATES = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+
+
+class FakeRasterDatabase:
+    def __init__(self, tmp_path, incomplete):
+        self.tmp_path = tmp_path
+        self.incomplete = incomplete
+        self.consolidated = []
+
+    def consolidated_raster_path(self, date_):
+        return self.tmp_path / f'{date_:%Y%m%d}.tif'
+
+    def consolidate_snodas_rasters(self, date_, force=False):
+        if date_ in self.incomplete:
+            raise IncompleteDateError(f'missing products for {date_}')
+        self.consolidated.append(date_)
+        return self.consolidated_raster_path(date_)
+
+
+def test_incomplete_dates_are_skipped(tmp_path, monkeypatch, capsys):
+    raster_db = FakeRasterDatabase(tmp_path, incomplete={DATES[1]})
+    monkeypatch.setattr(
+        consolidaterasters,
+        'settings',
+        SimpleNamespace(SNODAS_RASTERDB=tmp_path),
+    )
+    monkeypatch.setattr(
+        consolidaterasters,
+        'get_raster_database',
+        lambda _: raster_db,
+    )
+
+    consolidaterasters.Command().handle(dates=DATES)
+
+    assert raster_db.consolidated == [DATES[0], DATES[2]]
+    out = capsys.readouterr().out
+    assert f'Skipped 1 incomplete dates: {DATES[1]}' in out
+    assert 'Consolidated 2 dates.' in out
@@ -0,0 +1,77 @@
+import numpy
+import pytest
+
+from snodas.snodas.constants import TILE_NATIVE_ZOOM
+from snodas.snodas.coordinates import (
+    LatLon,
+    Pixel,
+    Tile,
+    decode_quadkeys,
+    encode_quadkeys,
+    latlons_to_pixels,
+    latlons_to_tiles,
+)
+
+
+@pytest.fixture
+def tiles():
+    tiles = 1 << TILE_NATIVE_ZOOM
+    return [Tile(row=row, col=col) for row in range(tiles) for col in range(tiles)]
+
+
+def test_quadkey_round_trip(tiles):
+    for tile in tiles:
+        assert Tile.from_quadkey(tile.quadkey) == tile
+
+
+def test_quadkey_digits():
+    zeros = '0' * (TILE_NATIVE_ZOOM - 2)
+    assert Tile(row=0, col=1).quadkey == zeros + '01'
+    assert Tile(row=1, col=0).quadkey == zeros + '02'
+    assert Tile(row=3, col=1).quadkey == zeros + '23'
+
+
+@pytest.mark.parametrize(
+    ('quadkey', 'match'),
+    [
+        ('0' * (TILE_NATIVE_ZOOM + 1), 'native zoom level'),
+        ('0' * (TILE_NATIVE_ZOOM - 1) + '4', 'Invalid quadkey'),
+        ('+' + '0' * (TILE_NATIVE_ZOOM - 1), 'Invalid quadkey'),
+    ],
+)
+def test_invalid_quadkeys(quadkey, match):
+    with pytest.raises(ValueError, match=match):
+        Tile.from_quadkey(quadkey)
+    with pytest.raises(ValueError, match=match):
+        decode_quadkeys([quadkey])
+
+
+def test_quadkey_arrays_match_tiles(tiles):
+    rows = [tile.row for tile in tiles]
+    cols = [tile.col for tile in tiles]
+    quadkeys = encode_quadkeys(rows, cols)
+
+    assert quadkeys == [tile.quadkey for tile in tiles]
+
+    decoded_rows, decoded_cols = decode_quadkeys(quadkeys)
+    assert decoded_rows.tolist() == rows
+    assert decoded_cols.tolist() == cols
+
+
+def test_latlon_arrays_match_latlons():
+    rng = numpy.random.default_rng(0)
+    lats = rng.uniform(25, 52, 100)
+    lons = rng.uniform(-124, -67, 100)
+    pixels = [
+        LatLon(lat=lat, lon=lon).to_pixel() for lat, lon in zip(lats, lons, strict=True)
+    ]
+
+    rows, cols = latlons_to_pixels(lats, lons)
+    assert [
+        Pixel(row=row, col=col) for row, col in zip(rows, cols, strict=True)
+    ] == pixels
+
+    tile_rows, tile_cols = latlons_to_tiles(lats, lons)
+    assert [
+        Tile(row=row, col=col) for row, col in zip(tile_rows, tile_cols, strict=True)
+    ] == [pixel.to_tile() for pixel in pixels]
@@ -0,0 +1,109 @@
+from datetime import date, datetime, time
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+from snodas.snodas import cube_store
+from snodas.snodas.constants import TILE_SIZE
+from snodas.snodas.coordinates import Tile
+from snodas.snodas.cube_store import DAYS, CubeStore
+from snodas.snodas.fileinfo import Product
+
+PRODUCT = Product.SNOW_WATER_EQUIVALENT
+TILE = Tile(row=3, col=5)
+MTIME = 10**18
+
+
+def tile_values(seed):
+    return (
+        numpy.random.default_rng(seed)
+        .integers(-9999, 1000, (TILE_SIZE, TILE_SIZE))
+        .astype(numpy.int16)
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CubeStore(tmp_path / 'cubes')
+
+
+def test_round_trip(store):
+    values = tile_values(0)
+    store.write_tile(PRODUCT, date(2024, 3, 1), TILE, values, MTIME)
+
+    assert store.has(PRODUCT, date(2024, 3, 1), TILE, MTIME)
+    read = store.read_tile(PRODUCT, date(2024, 3, 1), TILE, MTIME)
+    assert (read == values).all()
+    # reads are views of the memory mapped cube
+    assert not read.flags.writeable
+
+
+def test_missing_dates(store):
+    store.write_tile(PRODUCT, date(2024, 3, 1), TILE, tile_values(0), MTIME)
+
+    # another day of the same cube
+    assert not store.has(PRODUCT, date(2024, 3, 2), TILE, MTIME)
+    assert store.read_tile(PRODUCT, date(2024, 3, 2), TILE, MTIME) is None
+    # a year, product, or tile without a cube
+    assert store.read_tile(PRODUCT, date(2023, 3, 1), TILE, MTIME) is None
+    assert store.read_tile(Product.RUNOFF, date(2024, 3, 1), TILE, MTIME) is None
+    assert store.read_tile(PRODUCT, date(2024, 3, 1), Tile(row=3, col=6), MTIME) is None
+
+
+def test_changed_cog_is_not_read(store):
+    store.write_tile(PRODUCT, date(2024, 3, 1), TILE, tile_values(0), MTIME)
+
+    assert not store.has(PRODUCT, date(2024, 3, 1), TILE, MTIME + 1)
+    assert store.read_tile(PRODUCT, date(2024, 3, 1), TILE, MTIME + 1) is None
+
+
+def test_partial_year_cube(store):
+    days = {
+        date(2023, 1, 1): tile_values(1),
+        date(2023, 6, 30): tile_values(2),
+        # the last day of a year that is not a leap year
+        date(2023, 12, 31): tile_values(3),
+    }
+    for date_, values in days.items():
+        store.write_tile(PRODUCT, date_, TILE, values, MTIME)
+    # rewriting a day replaces only that day
+    days[date(2023, 6, 30)] = tile_values(4)
+    store.write_tile(PRODUCT, date(2023, 6, 30), TILE, days[date(2023, 6, 30)], MTIME)
+
+    for date_, values in days.items():
+        assert (store.read_tile(PRODUCT, date_, TILE, MTIME) == values).all()
+
+    cube = numpy.load(store._cube_path(PRODUCT, 2023, TILE), mmap_mode='r')
+    assert cube.shape == (DAYS, TILE_SIZE, TILE_SIZE)
+    written = numpy.load(store._dates_path(store._cube_path(PRODUCT, 2023, TILE)))
+    assert numpy.flatnonzero(written).tolist() == [0, 180, 364]
+    assert store.read_tile(PRODUCT, date(2023, 7, 1), TILE, MTIME) is None
+
+
+def test_add_raster_skips_stored_tiles(store, tmp_path, monkeypatch):
+    cog = tmp_path / 'swe.tif'
+    cog.touch()
+    fileinfo = SimpleNamespace(
+        path=cog,
+        product=PRODUCT,
+        datetime=datetime.combine(date(2024, 3, 1), time()),
+    )
+    tiles = [TILE, Tile(row=3, col=6)]
+    loaded = []
+
+    def load_tile(path, tile):
+        loaded.append(tile)
+        return tile_values(tile.col)
+
+    monkeypatch.setattr(cube_store, 'load_tile', load_tile)
+
+    assert store.add_raster(fileinfo, tiles) == len(tiles)
+    assert store.add_raster(fileinfo, tiles) == 0
+    assert store.add_raster(fileinfo, tiles, force=True) == len(tiles)
+    assert loaded == tiles * 2
+
+    mtime = cog.stat().st_mtime_ns
+    for tile in tiles:
+        read = store.read_tile(PRODUCT, date(2024, 3, 1), tile, mtime)
+        assert (read == tile_values(tile.col)).all()
@@ -0,0 +1,100 @@
+import gc
+import os
+import weakref
+
+from types import SimpleNamespace
+
+import pytest
+
+from snodas.snodas import dataset_pool
+from snodas.snodas.dataset_pool import DatasetPool
+
+
+class FakeDataset:
+    def __init__(self, path):
+        self.path = path
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """The datasets opened by the pool, in order."""
+    datasets = []
+
+    def open_ex(path, _flags):
+        datasets.append(FakeDataset(path))
+        return datasets[-1]
+
+    monkeypatch.setattr(
+        dataset_pool,
+        'gdal',
+        SimpleNamespace(OpenEx=open_ex, OF_RASTER=1, OF_READONLY=2),
+    )
+    return datasets
+
+
+@pytest.fixture
+def paths(tmp_path):
+    paths = [tmp_path / f'{name}.tif' for name in 'abc']
+    for path in paths:
+        path.touch()
+    return paths
+
+
+def test_reads_reuse_an_open_handle(opened, paths):
+    pool = DatasetPool(max_open=4)
+
+    with pool.dataset(paths[0]) as first:
+        pass
+    with pool.dataset(paths[0]) as second:
+        pass
+
+    assert second is first
+    assert len(opened) == 1
+    assert len(pool) == 1
+
+
+def test_handles_are_lent_to_one_reader_at_a_time(opened, paths):
+    pool = DatasetPool(max_open=4)
+
+    with pool.dataset(paths[0]) as first, pool.dataset(paths[0]) as second:
+        assert second is not first
+
+    assert len(opened) == 2
+    assert len(pool) == 2
+
+
+def test_evicting_closes_the_least_recently_used_handle(opened, paths):
+    pool = DatasetPool(max_open=2)
+    a, b, c = paths
+
+    for path in (a, b, a, c):
+        with pool.dataset(path):
+            pass
+
+    assert [ds.path for ds in opened] == [str(a), str(b), str(c)]
+    assert len(pool) == 2
+
+    # b was least recently used, and the pool held its only reference
+    (evicted,) = (weakref.ref(ds) for ds in opened if ds.path == str(b))
+    opened.clear()
+    gc.collect()
+    assert evicted() is None
+
+    with pool.dataset(a), pool.dataset(c):
+        pass
+    assert opened == []
+
+
+def test_rewritten_file_is_reopened(opened, paths):
+    pool = DatasetPool(max_open=4)
+    path = paths[0]
+
+    with pool.dataset(path) as first:
+        pass
+    mtime = path.stat().st_mtime_ns + 10**9
+    os.utime(path, ns=(mtime, mtime))
+    with pool.dataset(path) as second:
+        pass
+
+    assert second is not first
+    assert len(opened) == 2
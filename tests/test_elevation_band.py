@@ -0,0 +1,87 @@
+import numpy
+import pytest
+
+from snodas.snodas.elevation_band import ElevationBand, ElevationBandIndex
+
+
+@pytest.fixture
+def elevations():
+    rng = numpy.random.default_rng(0)
+    array = rng.uniform(-100, 4300, (200, 200)).astype(numpy.float32)
+    # nodata pixels should not fall into any band
+    array[0, :10] = -3.4e38
+    return array
+
+
+@pytest.mark.parametrize('step', [0, 100, 500, 1000])
+def test_band_index_matches_band_masks(elevations, step):
+    bands = tuple(ElevationBand.generate(size_ft=step))
+    # pixels exactly on a band edge must bin like the masks do
+    elevations[1, : len(bands)] = [band.min_meters for band in bands]
+    areas = numpy.ones_like(elevations)
+    index = ElevationBandIndex.from_elevations(elevations, areas, bands)
+    counts = numpy.bincount(index.array[index.array >= 0], minlength=len(index))
+
+    for idx, band in enumerate(bands):
+        mask = (elevations >= band.min_meters) & (elevations < band.max_meters)
+        assert counts[idx] == mask.sum()
+        assert index.area[idx] == areas[mask].sum()
+
+    assert (index.array[0, :10] == -1).all()
+
+
+def test_band_index_requires_contiguous_bands(elevations):
+    with pytest.raises(ValueError, match='not contiguous'):
+        ElevationBandIndex.from_elevations(
+            elevations,
+            numpy.ones_like(elevations),
+            (ElevationBand(0, 1000), ElevationBand(2000, 3000)),
+        )
+
+
+def test_band_index_excludes_pixels_outside_bands():
+    bands = (ElevationBand(0, 1000), ElevationBand(1000, 2000))
+    elevations = numpy.array(
+        [
+            bands[0].min_meters - 1,
+            bands[0].min_meters,
+            bands[1].min_meters,
+            bands[1].max_meters - 1,
+            # the top edge belongs to the band above, which we don't have
+            bands[1].max_meters,
+            bands[1].max_meters + 1,
+        ],
+        dtype=numpy.float32,
+    )
+    areas = numpy.arange(1, len(elevations) + 1, dtype=numpy.float32)
+
+    index = ElevationBandIndex.from_elevations(elevations, areas, bands)
+
+    assert index.array.tolist() == [-1, 0, 1, 1, -1, -1]
+    assert index.area.tolist() == [2, 3 + 4]
+
+
+def test_band_areas_are_weighted(elevations):
+    bands = tuple(ElevationBand.generate(size_ft=1000))
+    areas = numpy.random.default_rng(1).uniform(0.5, 1, elevations.shape)
+
+    index = ElevationBandIndex.from_elevations(elevations, areas, bands)
+
+    for idx, band in enumerate(bands):
+        mask = (elevations >= band.min_meters) & (elevations < band.max_meters)
+        assert index.area[idx] == pytest.approx(areas[mask].sum())
+
+
+def test_band_index_of_integer_elevations():
+    bands = (ElevationBand(0, 1000), ElevationBand(1000, 2000))
+    elevations = numpy.array([-1, 0, 304, 305, 609, 610], dtype=numpy.int16)
+
+    index = ElevationBandIndex.from_elevations(
+        elevations,
+        numpy.ones_like(elevations),
+        bands,
+    )
+
+    # 1000 ft is 304.8 m, and 2000 ft 609.6 m
+    assert index.array.tolist() == [-1, 0, 0, 1, 1, -1]
+    assert index.area.tolist() == [2, 2]
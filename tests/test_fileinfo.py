@@ -0,0 +1,113 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from snodas.snodas.fileinfo import (
+    Datatype,
+    Interval,
+    Offset,
+    Product,
+    Region,
+    SNODASFileInfo,
+    Timecode,
+    parse_name,
+)
+
+NAMES = {
+    'us_ssmv01025SlL01T0024TTNATS2024010105DP001': Product.PRECIP_SOLID,
+    'us_ssmv01025SlL00T0024TTNATS2024010105DP001': Product.PRECIP_LIQUID,
+    'us_ssmv11034tS__T0001TTNATS2024010105HP001': Product.SNOW_WATER_EQUIVALENT,
+    'us_ssmv11036tS__T0001TTNATS2024010105HP001': Product.SNOW_DEPTH,
+    'us_ssmv11038wS__A0024TTNATS2024010105DP001': Product.AVERAGE_TEMP,
+    'us_ssmv11050lL00T0024TTNATS2024010105DP001': Product.SUBLIMATION,
+    'us_ssmv11039lL00T0024TTNATS2024010105DP001': Product.SUBLIMATION_BLOWING,
+    'us_ssmv11044bS__T0024TTNATS2024010105DP001': Product.RUNOFF,
+}
+SWE = 'us_ssmv11034tS__T0001TTNATS2024010105HP001'
+
+
+@pytest.mark.parametrize(('name', 'product'), NAMES.items())
+def test_parse_name_products(name, product):
+    assert parse_name(name).product == product
+
+
+def test_parse_name_fields():
+    parsed = parse_name(SWE)
+
+    assert parsed.region == Region.US
+    assert parsed.datatype == Datatype.V1
+    assert not parsed.scaled
+    assert parsed.vcode == 'tS__'
+    assert parsed.timecode == Timecode.T0001
+    assert parsed.datetime == datetime(2024, 1, 1, 5, tzinfo=UTC)
+    assert parsed.interval == Interval.HOUR
+    assert parsed.offset == Offset.P001
+    assert parse_name('us_ssmv01025SlL01T0024TTNATS2024010105DP001').scaled
+    # parses are memoized by name
+    assert parse_name(SWE) is parsed
+
+
+@pytest.mark.parametrize(
+    'name',
+    [
+        '',
+        'readme',
+        # with the extension
+        f'{SWE}.tif',
+        # truncated
+        SWE[:-1],
+        'US_ssmv11034tS__T0001TTNATS2024010105HP001',
+        'us_ssmv11034tS__T0001TTNATS2024010105MP001',
+    ],
+)
+def test_parse_name_not_matching(name):
+    with pytest.raises(ValueError, match='unable to parse'):
+        parse_name(name)
+
+
+@pytest.mark.parametrize(
+    'name',
+    [
+        # an unknown product code
+        'us_ssmv11099tS__T0001TTNATS2024010105HP001',
+        # an unknown region
+        'ca_ssmv11034tS__T0001TTNATS2024010105HP001',
+        # an unknown precip vcode
+        'us_ssmv01025SlL02T0024TTNATS2024010105DP001',
+        # a date that does not exist
+        'us_ssmv11034tS__T0001TTNATS2024023005HP001',
+    ],
+)
+def test_parse_name_invalid_value(name):
+    with pytest.raises(ValueError, match='invalid value'):
+        parse_name(name)
+
+
+def test_from_directory_parses_rasters(tmp_path):
+    for name in NAMES:
+        (tmp_path / f'{name}.tif').touch()
+    # neither rasters nor parsed
+    (tmp_path / f'{SWE}.hdr').touch()
+    (tmp_path / f'{SWE}.tif.aux.xml').touch()
+    (tmp_path / 'notes.txt').touch()
+    (tmp_path / f'.{SWE}.tif').touch()
+
+    infos = SNODASFileInfo.from_directory(tmp_path, '.tif')
+
+    assert all(isinstance(info, SNODASFileInfo) for info in infos)
+    assert sorted(info.path for info in infos) == sorted(
+        tmp_path / f'{name}.tif' for name in NAMES
+    )
+    assert {info.name: info.product for info in infos} == NAMES
+
+
+def test_from_directory_empty(tmp_path):
+    assert SNODASFileInfo.from_directory(tmp_path, '.tif') == []
+
+
+def test_from_directory_unparseable_raster(tmp_path):
+    (tmp_path / f'{SWE}.tif').touch()
+    (tmp_path / 'elevation.tif').touch()
+
+    with pytest.raises(ValueError, match='unable to parse'):
+        SNODASFileInfo.from_directory(tmp_path, '.tif')
@@ -0,0 +1,90 @@
+import sqlite3
+
+from contextlib import closing
+from datetime import date
+
+import pytest
+
+from snodas.snodas.catalog import DATE_FORMAT
+from snodas.snodas.manifest import SCHEMA_VERSION, RasterManifest
+
+DATE = date(2024, 1, 1)
+NAME = 'us_ssmv11034tS__T0001TTNATS{}05HP001.tif'
+
+
+@pytest.fixture
+def cogs(tmp_path):
+    path = tmp_path / 'cogs'
+    directory = path / DATE.strftime(DATE_FORMAT)
+    directory.mkdir(parents=True)
+    (directory / NAME.format(DATE.strftime(DATE_FORMAT))).touch()
+    return path
+
+
+def user_version(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute('pragma user_version').fetchone()[0]
+
+
+def downgrade(path):
+    """Mark a manifest as of an older schema."""
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(f'pragma user_version = {SCHEMA_VERSION - 1}')
+
+
+def test_rebuild_is_current(cogs, tmp_path):
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+
+    assert manifest.rebuild() == 1
+    assert manifest.is_current()
+    assert list(manifest.dir_mtimes()) == [DATE]
+    assert [entry.path.name for entry in manifest.entries()] == [
+        NAME.format(DATE.strftime(DATE_FORMAT)),
+    ]
+
+
+def test_readers_leave_other_schemas_alone(cogs, tmp_path):
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+    manifest.rebuild()
+    downgrade(manifest.path)
+
+    # as good as absent, so the catalog walks cogs/ instead
+    assert manifest.cogs_mtime() is None
+    assert not manifest.is_current()
+    assert manifest.dir_mtimes() == {}
+    assert list(manifest.entries()) == []
+
+    assert user_version(manifest.path) == SCHEMA_VERSION - 1
+    with closing(sqlite3.connect(manifest.path)) as conn:
+        assert conn.execute('select count(*) from rasters').fetchone() == (1,)
+
+
+def test_readers_do_not_create_manifest(cogs, tmp_path):
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+
+    assert manifest.cogs_mtime() is None
+    assert list(manifest.entries()) == []
+    assert not manifest.exists()
+
+
+def test_record_date_replaces_other_schemas_as_incomplete(cogs, tmp_path):
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+    manifest.rebuild()
+    downgrade(manifest.path)
+
+    manifest.record_date(DATE)
+
+    assert user_version(manifest.path) == SCHEMA_VERSION
+    assert manifest.cogs_mtime() is None
+    assert list(manifest.dir_mtimes()) == [DATE]
+
+
+def test_rebuild_replaces_other_schemas(cogs, tmp_path):
+    manifest = RasterManifest(tmp_path / 'manifest.sqlite', cogs)
+    manifest.rebuild()
+    downgrade(manifest.path)
+
+    manifest.rebuild()
+
+    assert user_version(manifest.path) == SCHEMA_VERSION
+    assert manifest.is_current()
@@ -0,0 +1,176 @@
+from pathlib import Path
+
+import numpy
+import pytest
+
+from snodas.snodas import raster
+from snodas.snodas.constants import TILE_SIZE
+from snodas.snodas.coordinates import Tile
+from snodas.snodas.raster import AOIPixels, AOIRasterWithArea
+
+ORIGIN = Tile(row=10, col=20)
+# a partial last row and column of tiles, as AOI rasters end where the AOI does
+SHAPE = (2 * TILE_SIZE + 17, 2 * TILE_SIZE + 33)
+
+
+class FakeBandRaster:
+    """Random values seeded by band and tile, as one band of a raster."""
+
+    cubes = None
+
+    def __init__(self, path, band):
+        self.path = path
+        self.band = band
+
+    def load_tile(self, tile):
+        rng = numpy.random.default_rng([self.band, tile.row, tile.col])
+        return rng.integers(0, 1000, (TILE_SIZE, TILE_SIZE), dtype=numpy.int16)
+
+    def read_tile_into(self, tile, out):
+        out[...] = self.load_tile(tile)
+        return out
+
+
+@pytest.fixture
+def aoi():
+    rng = numpy.random.default_rng(0)
+    array = rng.uniform(0, 3000, SHAPE).astype(numpy.float32)
+    array[rng.random(SHAPE) < 0.3] = -9999
+    array[0, :5] = numpy.nan
+    # the tile at (0, 1) has no in-polygon pixels
+    array[:TILE_SIZE, TILE_SIZE : 2 * TILE_SIZE] = -9999
+    return AOIRasterWithArea(
+        path=Path('aoi.tif'),
+        array=array,
+        # the pixels of tiles that are not intersected are dropped
+        intersected_tiles=[
+            Tile(row=ORIGIN.row + row, col=ORIGIN.col + col)
+            for row, col in [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2)]
+        ],
+        origin=ORIGIN.origin(),
+        min_elevation=0,
+        max_elevation=3000,
+        nodata=-9999,
+        area=rng.uniform(0.5, 1, SHAPE).astype(numpy.float32),
+    )
+
+
+def pixel_positions(pixels):
+    """The (row, col) within the AOI array of each pixel."""
+    rows = numpy.empty(len(pixels), dtype=numpy.intp)
+    cols = numpy.empty(len(pixels), dtype=numpy.intp)
+    for idx, tile in enumerate(pixels.tiles):
+        start, end = pixels.offsets[idx], pixels.offsets[idx + 1]
+        tile_rows, tile_cols = numpy.divmod(pixels.tile_index[start:end], TILE_SIZE)
+        rows[start:end] = (tile.row - ORIGIN.row) * TILE_SIZE + tile_rows
+        cols[start:end] = (tile.col - ORIGIN.col) * TILE_SIZE + tile_cols
+    return rows, cols
+
+
+def test_pixels_are_the_in_polygon_pixels_of_intersected_tiles(aoi):
+    pixels = AOIPixels.from_aoi_raster(aoi)
+
+    assert pixels.tiles == (
+        Tile(row=ORIGIN.row, col=ORIGIN.col),
+        Tile(row=ORIGIN.row, col=ORIGIN.col + 2),
+        Tile(row=ORIGIN.row + 1, col=ORIGIN.col + 1),
+        Tile(row=ORIGIN.row + 1, col=ORIGIN.col + 2),
+    )
+    assert pixels.offsets[0] == 0
+    assert pixels.offsets[-1] == len(pixels)
+    assert (numpy.diff(pixels.offsets) > 0).all()
+
+    intersected = numpy.zeros(SHAPE, dtype=bool)
+    for tile in aoi.intersected_tiles:
+        row = (tile.row - ORIGIN.row) * TILE_SIZE
+        col = (tile.col - ORIGIN.col) * TILE_SIZE
+        intersected[row : row + TILE_SIZE, col : col + TILE_SIZE] = True
+    expected = numpy.isfinite(aoi.array) & (aoi.array != aoi.nodata) & intersected
+
+    rows, cols = pixel_positions(pixels)
+    mask = numpy.zeros(SHAPE, dtype=bool)
+    mask[rows, cols] = True
+    assert len(pixels) == expected.sum()
+    assert (mask == expected).all()
+    assert (pixels.elevation == aoi.array[rows, cols]).all()
+    assert (pixels.area == aoi.area[rows, cols]).all()
+
+
+def test_load_raster_values(aoi):
+    pixels = AOIPixels.from_aoi_raster(aoi)
+    source = FakeBandRaster(Path('snodas.tif'), band=1)
+    values = numpy.empty(len(pixels), dtype=numpy.int16)
+
+    pixels.load_raster_values(source, values)
+
+    rows, cols = pixel_positions(pixels)
+    for idx, tile in enumerate(pixels.tiles):
+        start, end = pixels.offsets[idx], pixels.offsets[idx + 1]
+        offset_row = (tile.row - ORIGIN.row) * TILE_SIZE
+        offset_col = (tile.col - ORIGIN.col) * TILE_SIZE
+        assert (
+            values[start:end]
+            == source.load_tile(tile)[
+                rows[start:end] - offset_row,
+                cols[start:end] - offset_col,
+            ]
+        ).all()
+
+
+def test_load_rasters_values_of_separate_rasters(aoi):
+    pixels = AOIPixels.from_aoi_raster(aoi)
+    rasters = [FakeBandRaster(Path(f'{band}.tif'), band) for band in (1, 2)]
+    stack = numpy.empty((len(rasters), len(pixels)), dtype=numpy.int16)
+
+    pixels.load_rasters_values(rasters, stack)
+
+    for idx, source in enumerate(rasters):
+        values = numpy.empty(len(pixels), dtype=numpy.int16)
+        pixels.load_raster_values(source, values)
+        assert (stack[idx] == values).all()
+
+
+def test_load_rasters_values_of_consolidated_raster(aoi, monkeypatch):
+    pixels = AOIPixels.from_aoi_raster(aoi)
+    path = Path('consolidated.tif')
+    rasters = [FakeBandRaster(path, band) for band in (3, 1, 2)]
+    reads = []
+
+    def read_tile_bands_into(path_, tile, bands, out):
+        reads.append((path_, tile, bands))
+        for idx, band in enumerate(bands):
+            out[idx] = FakeBandRaster(path_, band).load_tile(tile)
+        return out
+
+    monkeypatch.setattr(raster, 'read_tile_bands_into', read_tile_bands_into)
+    stack = numpy.empty((len(rasters), len(pixels)), dtype=numpy.int16)
+
+    pixels.load_rasters_values(rasters, stack)
+
+    # every band of a tile is read at once
+    assert reads == [(path, tile, [3, 1, 2]) for tile in pixels.tiles]
+    for idx, source in enumerate(rasters):
+        values = numpy.empty(len(pixels), dtype=numpy.int16)
+        pixels.load_raster_values(source, values)
+        assert (stack[idx] == values).all()
+
+
+def test_aoi_without_nodata_value():
+    array = numpy.ones((TILE_SIZE, TILE_SIZE), dtype=numpy.float32)
+    array[0, 0] = numpy.nan
+    aoi = AOIRasterWithArea(
+        path=Path('aoi.tif'),
+        array=array,
+        intersected_tiles=[ORIGIN],
+        origin=ORIGIN.origin(),
+        min_elevation=1,
+        max_elevation=1,
+        nodata=None,
+        area=numpy.ones_like(array),
+    )
+
+    pixels = AOIPixels.from_aoi_raster(aoi)
+
+    assert pixels.tiles == (ORIGIN,)
+    assert len(pixels) == TILE_SIZE * TILE_SIZE - 1
+    assert pixels.tile_index[0] == 1
@@ -0,0 +1,304 @@
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+from snodas.snodas import zonal_stats
+from snodas.snodas.constants import NODATA, TILE_SIZE
+from snodas.snodas.coordinates import Tile
+from snodas.snodas.elevation_band import ElevationBand, ElevationBandIndex
+from snodas.snodas.fileinfo import Product
+from snodas.snodas.raster import AOIRasterWithArea
+from snodas.snodas.zonal_stats import BandStats, ScratchBuffers, ZonalStats
+
+DATE = date(2024, 1, 1)
+PRODUCTS = (Product.SNOW_WATER_EQUIVALENT, Product.SNOW_DEPTH)
+ORIGIN = Tile(row=3, col=5)
+SHAPE = (2 * TILE_SIZE, 3 * TILE_SIZE)
+
+
+class FakeRaster:
+    """Random values seeded by the raster and tile, so a raster
+    reads the same in any process it is pickled to."""
+
+    cubes = None
+
+    def __init__(self, date_, product, seed, nodata=0.05):
+        self.path = Path(f'{date_:%Y%m%d}_{product}.tif')
+        self.fileinfo = SimpleNamespace(
+            datetime=datetime.combine(date_, time()),
+            product=product,
+        )
+        self.seed = seed
+        self.nodata = nodata
+
+    def load_tile(self, tile):
+        rng = numpy.random.default_rng([self.seed, tile.row, tile.col])
+        values = rng.integers(0, 1000, (TILE_SIZE, TILE_SIZE), dtype=numpy.int16)
+        values[rng.random(values.shape) < self.nodata] = NODATA
+        return values
+
+    def read_tile_into(self, tile, out):
+        out[...] = self.load_tile(tile)
+        return out
+
+
+@pytest.fixture
+def aoi():
+    rng = numpy.random.default_rng(0)
+    array = rng.uniform(0, 3000, SHAPE).astype(numpy.float32)
+    # pixels outside of the DEM range are in no band
+    array[:10, :10] = 5000
+    array[-10:, -10:] = -500
+    array[rng.random(SHAPE) < 0.3] = -9999
+    return AOIRasterWithArea(
+        path=Path('aoi.tif'),
+        array=array,
+        # the last tile is not intersected, so its pixels are dropped
+        intersected_tiles=[
+            Tile(row=ORIGIN.row + row, col=ORIGIN.col + col)
+            for row in range(2)
+            for col in range(3)
+            if (row, col) != (1, 2)
+        ],
+        origin=ORIGIN.origin(),
+        min_elevation=0,
+        max_elevation=3000,
+        nodata=-9999,
+        area=rng.uniform(0.5, 1, SHAPE).astype(numpy.float32),
+    )
+
+
+def rasters_by_date(days, products=PRODUCTS):
+    return [
+        [
+            FakeRaster(DATE + timedelta(days=day), product, seed=day * 10 + idx)
+            for idx, product in enumerate(products)
+        ]
+        for day in range(days)
+    ]
+
+
+def band_index(aoi, step=500):
+    return ElevationBandIndex.from_elevations(
+        aoi.pixels.elevation,
+        aoi.pixels.area,
+        ElevationBand.generate(size_ft=step),
+    )
+
+
+def assert_stats_equal(stats, expected):
+    assert stats.date == expected.date
+    assert stats.products == expected.products
+    numpy.testing.assert_array_equal(stats.count, expected.count)
+    # empty bands have nan means, which compare equal here
+    numpy.testing.assert_array_equal(stats.mean, expected.mean)
+    numpy.testing.assert_array_equal(stats.area, expected.area)
+
+
+def fine_stats(counts):
+    counts = numpy.array([counts], dtype=numpy.int64)
+    return BandStats(
+        date=DATE,
+        products=[Product.SNOW_WATER_EQUIVALENT],
+        mean=numpy.where(counts > 0, numpy.arange(counts.size), numpy.nan),
+        count=counts,
+        area=counts * 2.0,
+    )
+
+
+def fine_bands(count):
+    return tuple(ElevationBand(idx * 100, (idx + 1) * 100) for idx in range(count))
+
+
+def test_merge_bands_weights_means_by_count():
+    merged = fine_stats([1, 3, 0, 0, 2, 0]).merge_bands(
+        fine_bands(6),
+        (ElevationBand(0, 300), ElevationBand(300, 600)),
+    )
+
+    assert merged.count.tolist() == [[4, 2]]
+    assert merged.area.tolist() == [[8.0, 4.0]]
+    assert merged.mean[0, 0] == pytest.approx((0 * 1 + 1 * 3) / 4)
+    assert merged.mean[0, 1] == pytest.approx(4.0)
+
+
+def test_merge_bands_without_pixels_is_empty():
+    merged = fine_stats([0, 0]).merge_bands(fine_bands(2), (ElevationBand(0, 200),))
+
+    assert merged.count.tolist() == [[0]]
+    assert merged.area.tolist() == [[0]]
+    assert numpy.isnan(merged.mean).all()
+
+
+def test_merge_bands_requires_whole_fine_bands():
+    with pytest.raises(ValueError, match='not within a single band'):
+        fine_stats([1, 1, 1]).merge_bands(
+            fine_bands(3),
+            (ElevationBand(0, 150), ElevationBand(150, 300)),
+        )
+
+
+def test_merge_bands_matches_coarse_calculation(aoi):
+    (rasters,) = rasters_by_date(1)
+    fine = band_index(aoi, 100)
+    coarse = band_index(aoi, 1000)
+    merged = ZonalStats._calc(aoi.pixels, rasters, fine).merge_bands(
+        fine.bands,
+        coarse.bands,
+    )
+    expected = ZonalStats._calc(aoi.pixels, rasters, coarse)
+
+    numpy.testing.assert_array_equal(merged.count, expected.count)
+    # sums are taken in a different order, so may differ in the last bits
+    numpy.testing.assert_allclose(merged.mean, expected.mean)
+    numpy.testing.assert_allclose(merged.area, expected.area)
+
+
+@pytest.mark.parametrize(
+    ('step', 'base', 'expected'),
+    [
+        (1000, 100, 100),
+        (250, 100, 250),
+        (0, 100, 0),
+        (-100, 100, 0),
+        (1000, None, 1000),
+    ],
+)
+def test_computed_step(step, base, expected):
+    assert ZonalStats.computed_step(step, base) == expected
+
+
+@pytest.mark.parametrize(
+    ('step', 'base', 'expected'),
+    [
+        (1000, 100, True),
+        (100, 100, True),
+        (250, 100, False),
+        (-7, 100, True),
+        (1000, None, True),
+        (250, None, False),
+    ],
+)
+def test_persisted_step(step, base, expected):
+    assert ZonalStats.persisted_step(step, base) is expected
+
+
+def test_parallel_matches_serial(aoi):
+    by_date = rasters_by_date(4)
+    index = band_index(aoi)
+
+    serial = list(ZonalStats._iter_calc_serial(aoi.pixels, by_date, index))
+    parallel = list(
+        ZonalStats._iter_calc_parallel(aoi.pixels, by_date, index, max_workers=2),
+    )
+
+    assert len(parallel) == len(serial)
+    for parallel_stats, serial_stats in zip(parallel, serial, strict=True):
+        assert_stats_equal(parallel_stats, serial_stats)
+
+
+def test_parallel_workers_are_reused_across_aois(aoi):
+    by_date = rasters_by_date(4)
+
+    for step in (500, 1000):
+        index = band_index(aoi, step)
+        serial = list(ZonalStats._iter_calc_serial(aoi.pixels, by_date, index))
+        parallel = list(
+            ZonalStats._iter_calc_parallel(aoi.pixels, by_date, index, max_workers=2),
+        )
+        for parallel_stats, serial_stats in zip(parallel, serial, strict=True):
+            assert_stats_equal(parallel_stats, serial_stats)
+
+        pools = zonal_stats._worker_pools[2]
+        if step == 500:
+            first_pools = pools
+
+    assert pools is first_pools
+
+
+def test_parallel_stops_early(aoi):
+    per_date = ZonalStats._iter_calc_parallel(
+        aoi.pixels,
+        rasters_by_date(8),
+        band_index(aoi),
+        max_workers=2,
+    )
+    next(per_date)
+    per_date.close()
+
+    # the pools are still usable by the next request
+    (stats,) = ZonalStats._iter_calc_parallel(
+        aoi.pixels,
+        rasters_by_date(1),
+        band_index(aoi),
+        max_workers=2,
+    )
+    assert stats.date == DATE
+
+
+def masked_stats(aoi, rasters, bands):
+    """The stats of each band taken with a mask per band, over
+    the whole AOI array, as they were before the band index."""
+    values = numpy.full((len(rasters), *SHAPE), NODATA, dtype=numpy.int16)
+    for tile in aoi.intersected_tiles:
+        row = (tile.row - ORIGIN.row) * TILE_SIZE
+        col = (tile.col - ORIGIN.col) * TILE_SIZE
+        for idx, raster in enumerate(rasters):
+            values[idx, row : row + TILE_SIZE, col : col + TILE_SIZE] = (
+                raster.load_tile(tile)
+            )
+
+    shape = (len(rasters), len(bands))
+    mean = numpy.full(shape, numpy.nan)
+    count = numpy.zeros(shape, dtype=numpy.int64)
+    area = numpy.zeros(shape)
+    in_aoi = aoi.array != aoi.nodata
+    for band_idx, band in enumerate(bands):
+        in_band = (
+            in_aoi & (aoi.array >= band.min_meters) & (aoi.array < band.max_meters)
+        )
+        for idx in range(len(rasters)):
+            mask = in_band & (values[idx] != NODATA)
+            count[idx, band_idx] = mask.sum()
+            if count[idx, band_idx]:
+                mean[idx, band_idx] = values[idx][mask].mean()
+                area[idx, band_idx] = aoi.area[mask].sum(dtype=numpy.float64)
+
+    return mean, count, area
+
+
+@pytest.mark.parametrize('step', [0, 500, 1000])
+def test_calc_matches_band_masks(aoi, step):
+    rasters = [
+        FakeRaster(DATE, Product.SNOW_WATER_EQUIVALENT, seed=1),
+        FakeRaster(DATE, Product.SNOW_DEPTH, seed=2, nodata=0.5),
+        # a product without any data has every band empty
+        FakeRaster(DATE, Product.RUNOFF, seed=3, nodata=1),
+    ]
+    index = band_index(aoi, step)
+
+    stats = ZonalStats._calc(aoi.pixels, rasters, index)
+    mean, count, area = masked_stats(aoi, rasters, index.bands)
+
+    assert stats.date == DATE
+    assert stats.products == [raster.fileinfo.product for raster in rasters]
+    numpy.testing.assert_array_equal(stats.count, count)
+    numpy.testing.assert_allclose(stats.mean, mean)
+    numpy.testing.assert_allclose(stats.area, area)
+    if step:
+        # the bands above the AOI are empty, but still in the stats
+        assert not count[:, -1].any()
+
+
+def test_calc_reuses_scratch_across_band_indexes(aoi):
+    (rasters,) = rasters_by_date(1)
+    scratch = ScratchBuffers()
+
+    for step in (500, 1000, 500):
+        index = band_index(aoi, step)
+        stats = ZonalStats._calc(aoi.pixels, rasters, index, scratch)
+        _, count, _ = masked_stats(aoi, rasters, index.bands)
+        numpy.testing.assert_array_equal(stats.count, count)
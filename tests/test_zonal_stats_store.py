@@ -0,0 +1,174 @@
+import os
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+from snodas.snodas.elevation_band import ElevationBand
+from snodas.snodas.fileinfo import Product
+from snodas.snodas.zonal_stats import BandStats
+from snodas.snodas.zonal_stats_store import ZonalStatsStore
+
+BANDS = (ElevationBand(0, 1000), ElevationBand(1000, 2000))
+PRODUCTS = (Product.SNOW_WATER_EQUIVALENT, Product.SNOW_DEPTH)
+
+
+@pytest.fixture
+def aoi(tmp_path):
+    path = tmp_path / 'aoi.tif'
+    path.touch()
+    return SimpleNamespace(path=path)
+
+
+def raster(tmp_path, date_, product):
+    path = tmp_path / f'{date_:%Y%m%d}_{product}.tif'
+    path.touch()
+    return SimpleNamespace(
+        path=path,
+        fileinfo=SimpleNamespace(
+            datetime=datetime.combine(date_, datetime.min.time()),
+            product=product,
+        ),
+    )
+
+
+def stats(rasters):
+    count = numpy.tile(numpy.arange(1, len(BANDS) + 1), (len(rasters), 1))
+    return BandStats(
+        date=rasters[0].fileinfo.datetime.date(),
+        products=[r.fileinfo.product for r in rasters],
+        mean=count.astype(float),
+        count=count,
+        area=count * 2.0,
+    )
+
+
+def assert_stats_equal(stats, expected):
+    assert stats.date == expected.date
+    assert stats.products == expected.products
+    numpy.testing.assert_array_equal(stats.mean, expected.mean)
+    numpy.testing.assert_array_equal(stats.count, expected.count)
+    numpy.testing.assert_array_equal(stats.area, expected.area)
+
+
+def store_rasters(tmp_path, aoi, dates):
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, BANDS)
+    per_date = [[raster(tmp_path, d, p) for p in PRODUCTS] for d in dates]
+    for rasters in per_date:
+        store.add(stats(rasters), rasters)
+    store.flush()
+    return per_date
+
+
+def test_round_trip(tmp_path, aoi):
+    per_date = store_rasters(
+        tmp_path,
+        aoi,
+        [date(2023, 12, 31), date(2024, 1, 1), date(2024, 1, 2)],
+    )
+
+    assert sorted(p.name for p in (tmp_path / 'store').glob('*.npz')) == [
+        '2023.npz',
+        '2024.npz',
+    ]
+
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, BANDS)
+    for rasters in per_date:
+        for r in rasters:
+            assert store.has(r)
+            assert_stats_equal(store.get(r), stats([r]))
+
+
+def test_concurrent_stores_keep_each_others_rows(tmp_path, aoi):
+    (first,) = store_rasters(tmp_path, aoi, [date(2024, 1, 1)])
+    (second,) = store_rasters(tmp_path, aoi, [date(2024, 1, 2)])
+
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, BANDS)
+    assert all(store.has(r) for r in first + second)
+
+
+def test_changed_source_is_not_stored(tmp_path, aoi):
+    ((changed, unchanged),) = store_rasters(tmp_path, aoi, [date(2024, 1, 1)])
+    mtime = changed.path.stat().st_mtime_ns
+    os.utime(changed.path, ns=(mtime + 10**9, mtime + 10**9))
+
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, BANDS)
+    assert not store.has(changed)
+    assert store.get(changed) is None
+    assert store.has(unchanged)
+
+
+def test_changed_aoi_discards_store(tmp_path, aoi):
+    ((stored, _),) = store_rasters(tmp_path, aoi, [date(2024, 1, 1)])
+    mtime = aoi.path.stat().st_mtime_ns
+    os.utime(aoi.path, ns=(mtime + 10**9, mtime + 10**9))
+
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, BANDS)
+    assert not store.has(stored)
+
+
+def test_band_mismatch_discards_store(tmp_path, aoi):
+    ((stored, _),) = store_rasters(tmp_path, aoi, [date(2024, 1, 1)])
+
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, (ElevationBand(0, 2000),))
+    assert not store.has(stored)
+    assert store.get(stored) is None
+
+
+def test_add_writes_out_earlier_years(tmp_path, aoi):
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, BANDS)
+
+    for date_ in (date(2023, 12, 31), date(2024, 1, 1)):
+        rasters = [raster(tmp_path, date_, p) for p in PRODUCTS]
+        store.add(stats(rasters), rasters)
+
+    assert store.year_path(2023).exists()
+    assert not store.year_path(2024).exists()
+
+    store.flush()
+    with numpy.load(store.year_path(2024)) as npz:
+        assert npz['mean'].shape == (len(PRODUCTS), len(BANDS))
+
+
+def test_only_occupied_bands_are_written(tmp_path, aoi):
+    bands = (*BANDS, ElevationBand(2000, 3000))
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, bands)
+    rasters = [raster(tmp_path, date(2024, 1, 1), p) for p in PRODUCTS]
+    count = numpy.array([[0, 2, 0], [0, 0, 0]])
+    added = BandStats(
+        date=date(2024, 1, 1),
+        products=list(PRODUCTS),
+        mean=numpy.where(count > 0, 1.0, numpy.nan),
+        count=count,
+        area=count * 2.0,
+    )
+    store.add(added, rasters)
+    store.flush()
+
+    with numpy.load(store.year_path(2024)) as npz:
+        assert int(npz['band_offset']) == 1
+        assert npz['count'].shape == (len(PRODUCTS), 1)
+
+    store = ZonalStatsStore(tmp_path / 'store')
+    store.load(aoi, bands)
+    for idx, r in enumerate(rasters):
+        assert_stats_equal(
+            store.get(r),
+            BandStats(
+                date=added.date,
+                products=[r.fileinfo.product],
+                mean=added.mean[idx : idx + 1],
+                count=added.count[idx : idx + 1],
+                area=added.area[idx : idx + 1],
+            ),
+        )